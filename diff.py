@@ -0,0 +1,245 @@
+"""
+Compares two spec trees structurally, without expanding either of them.
+
+The spec trees are aligned node spec by node spec from their roots. Divergent
+branch members are aligned by name, so that inserting or removing a branch
+doesn't misalign the branches after it. The change in the size of each layer of
+the expanded tree is computed analytically, using `treespec.layer_sizes()`.
+"""
+
+import sys
+import difflib
+from typing import Optional
+
+import utils
+from treespec import Node, Relation, parse, layer_sizes
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+RENAMED = "renamed"
+
+# Object Model
+# --------------------------------------------------
+
+class Change:
+    """
+    A single structural change between two spec trees.
+
+    - kind: One of:
+      - `ADDED`/`REMOVED`: A relation (`before`/`after` is the relation and
+        the subtree it relates to, eg. `{2XC}->B->C`) or divergent branch member
+        (the member's subtree) was added or removed.
+      - `CHANGED`: A relation's spec changed (`before` and `after` are the
+        relation specs, eg. `{2XC}` and `{3IC}`).
+      - `RENAMED`: A node spec's name changed.
+    - path: The names of the node specs from the root to the changed node spec,
+      as named in the new spec tree (or the old one, for removals). Divergent
+      branch members are prefixed with their index, eg. `[1]E`.
+    """
+
+    def __init__(self, kind, path, before, after):
+        self.kind = kind
+        self.path = tuple(path)
+        self.before = before
+        self.after = after
+
+    def __eq__(self, other):
+        return (
+            self.kind == other.kind
+            and self.path == other.path
+            and self.before == other.before
+            and self.after == other.after
+        )
+
+    def __repr__(self):
+        return (
+            f"Change({self.kind!r}, {self.path!r},"
+            f" {self.before!r}, {self.after!r})"
+        )
+
+    def __str__(self):
+        path = " -> ".join(self.path)
+        if self.kind == ADDED:
+            return f"{path}: added {self.after}"
+        elif self.kind == REMOVED:
+            return f"{path}: removed {self.before}"
+        else:
+            return f"{path}: {self.kind} {self.before} to {self.after}"
+
+class Diff:
+    """
+    The structural changes between two spec trees, and the sizes of each layer
+    of their expanded trees.
+    """
+
+    def __init__(self, changes, sizes_before, sizes_after):
+        self.changes = changes
+        self.sizes_before = sizes_before
+        self.sizes_after = sizes_after
+
+    def __bool__(self):
+        return len(self.changes) > 0
+
+    def layer_deltas(self) -> list:
+        """Return the change in the number of nodes in each layer."""
+
+        num_layers = max(len(self.sizes_before), len(self.sizes_after))
+        before = utils.pad_list(self.sizes_before, num_layers, 0)
+        after = utils.pad_list(self.sizes_after, num_layers, 0)
+        return [b - a for (a, b) in zip(before, after)]
+
+    def total_delta(self) -> int:
+        """Return the change in the total number of nodes."""
+        return sum(self.sizes_after) - sum(self.sizes_before)
+
+    def __str__(self):
+        lines = [str(change) for change in self.changes]
+        for (i, delta) in enumerate(self.layer_deltas()):
+            if delta != 0:
+                lines.append(f"layer {i}: {delta:+} nodes")
+        lines.append(f"total: {self.total_delta():+} nodes")
+        return "\n".join(lines)
+
+# Differ
+# --------------------------------------------------
+
+def _rel_spec(rel: Relation) -> str:
+    rel_spec = str(rel.get_num())
+    rel_spec += "I" if rel.is_inclusive() else "X"
+    rel_spec += "D" if utils.is_iterable(rel.get_next()) else "C"
+    return "{" + rel_spec + "}"
+
+def _next_nodes(rel: Relation) -> list:
+    next_nodes = rel.get_next()
+    if utils.is_iterable(next_nodes):
+        return list(next_nodes)
+    return [next_nodes]
+
+def _step(node: Node, index: Optional[int]) -> str:
+    if index is None:
+        return node.get_name()
+    return f"[{index}]{node.get_name()}"
+
+class _Differ:
+    """
+    Compares spec trees using an explicit stack of work items, each of which
+    is either a pair of nodes (with the path to them) to compare, or a change
+    to report, so that changes are reported in depth-first order without
+    recursing once per layer.
+    """
+
+    def __init__(self):
+        self.changes = []
+        self.visited = set()
+
+    def run(self, a: Node, b: Node, path: list):
+        stack = [(a, b, path)]
+        while len(stack) > 0:
+            item = stack.pop()
+            if isinstance(item, Change):
+                self.changes.append(item)
+            else:
+                # Push in reverse, so items are handled in order
+                stack.extend(reversed(self.node(*item)))
+
+    def node(self, a: Node, b: Node, path: list) -> list:
+        """
+        Compare two nodes, and return the work items for their members.
+        """
+
+        # Shared subtrees are only compared (and reported) once
+        key = (id(a), id(b))
+        if key in self.visited:
+            return []
+        self.visited.add(key)
+
+        if a.get_name() != b.get_name():
+            self.changes.append(Change(RENAMED, path, a.get_name(), b.get_name()))
+
+        rel_a = a.get_relation()
+        rel_b = b.get_relation()
+        if rel_a is None and rel_b is None:
+            return []
+        elif rel_a is None:
+            self.changes.append(Change(ADDED, path, None, rel_b.str()))
+            return []
+        elif rel_b is None:
+            self.changes.append(Change(REMOVED, path, rel_a.str(), None))
+            return []
+
+        if _rel_spec(rel_a) != _rel_spec(rel_b):
+            self.changes.append(
+                Change(CHANGED, path, _rel_spec(rel_a), _rel_spec(rel_b)))
+
+        return self.members(rel_a, rel_b, path)
+
+    def members(self, rel_a: Relation, rel_b: Relation, path: list) -> list:
+        """
+        Align the members of two relations, and return the work items for
+        them: pairs of members to compare, and added/removed members.
+        """
+
+        next_a = _next_nodes(rel_a)
+        next_b = _next_nodes(rel_b)
+        divergent_a = utils.is_iterable(rel_a.get_next())
+        divergent_b = utils.is_iterable(rel_b.get_next())
+
+        def step_a(i):
+            return _step(next_a[i], i if divergent_a else None)
+
+        def step_b(j):
+            return _step(next_b[j], j if divergent_b else None)
+
+        matcher = difflib.SequenceMatcher(
+            None,
+            [n.get_name() for n in next_a],
+            [n.get_name() for n in next_b],
+            autojunk=False
+        )
+        items = []
+        for (op, a_start, a_end, b_start, b_end) in matcher.get_opcodes():
+            # Pair up members positionally, and add/remove the rest
+            paired = min(a_end - a_start, b_end - b_start)
+            for k in range(paired):
+                (i, j) = (a_start + k, b_start + k)
+                items.append((next_a[i], next_b[j], path + [step_b(j)]))
+            for i in range(a_start + paired, a_end):
+                items.append(Change(
+                    REMOVED, path + [step_a(i)], next_a[i].str(), None))
+            for j in range(b_start + paired, b_end):
+                items.append(Change(
+                    ADDED, path + [step_b(j)], None, next_b[j].str()))
+        return items
+
+def diff(spec_a: Optional[Node], spec_b: Optional[Node]) -> Diff:
+    """
+    Return the structural changes from spec tree `spec_a` to spec tree
+    `spec_b`, without expanding either of them.
+    """
+
+    differ = _Differ()
+    if spec_a is not None and spec_b is not None:
+        differ.run(spec_a, spec_b, [spec_b.get_name()])
+    elif spec_a is not None:
+        differ.changes.append(
+            Change(REMOVED, [spec_a.get_name()], spec_a.str(), None))
+    elif spec_b is not None:
+        differ.changes.append(
+            Change(ADDED, [spec_b.get_name()], None, spec_b.str()))
+
+    return Diff(differ.changes, layer_sizes(spec_a), layer_sizes(spec_b))
+
+# Direct Usage
+# --------------------------------------------------
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(
+            "You must provide two spec arguments.",
+            "Syntax: python diff.py <spec_str_a> <spec_str_b>",
+            sep="\n"
+        )
+        sys.exit(1)
+
+    print(diff(parse(sys.argv[1]), parse(sys.argv[2])))
@@ -0,0 +1,67 @@
+from diff import *
+from treespec import parse
+
+def test_diff_same():
+    d = diff(parse("a {2XC}-> b"), parse("a{2XC}->b"))
+    assert not d
+    assert d.layer_deltas() == [0, 0]
+    assert d.total_delta() == 0
+
+def test_diff_empty():
+    assert not diff(parse(""), parse(""))
+    assert diff(parse(""), parse("a -> b")).changes == [
+        Change(ADDED, ["a"], None, "a->b")]
+    assert diff(parse("a"), parse("")).layer_deltas() == [-1]
+
+def test_diff_changed_relation():
+    d = diff(parse("a {2XC}-> b -> c"), parse("a {3IC}-> b -> c"))
+    assert d.changes == [Change(CHANGED, ["a"], "{2XC}", "{3IC}")]
+    assert d.layer_deltas() == [0, 1, 1]
+    assert d.total_delta() == 2
+
+def test_diff_renamed():
+    d = diff(parse("a -> b -> c"), parse("a -> x -> c"))
+    assert d.changes == [Change(RENAMED, ["a", "x"], "b", "x")]
+    assert d.total_delta() == 0
+
+def test_diff_added_removed_relation():
+    d = diff(parse("a -> b"), parse("a -> b {2XC}-> c"))
+    assert d.changes == [Change(ADDED, ["a", "b"], None, "{2XC}->c")]
+    assert d.layer_deltas() == [0, 0, 2]
+
+    d = diff(parse("a -> b {2XC}-> c"), parse("a -> b"))
+    assert d.changes == [Change(REMOVED, ["a", "b"], "{2XC}->c", None)]
+
+def test_diff_branches():
+    d = diff(
+        parse("a {2XD}-> (b, c {2IC}-> d)"),
+        parse("a {3XD}-> (x -> y, b, c {2IC}-> d)")
+    )
+    assert d.changes == [
+        Change(CHANGED, ["a"], "{2XD}", "{3XD}"),
+        Change(ADDED, ["a", "[0]x"], None, "x->y"),
+    ]
+    assert d.layer_deltas() == [0, 1, 1]
+
+def test_diff_consistent_to_divergent():
+    d = diff(parse("a {2XC}-> b"), parse("a {2XD}-> (b, c)"))
+    assert d.changes == [
+        Change(CHANGED, ["a"], "{2XC}", "{2XD}"),
+        Change(ADDED, ["a", "[1]c"], None, "c"),
+    ]
+    assert d.total_delta() == 0
+
+def test_diff_shared_reported_once():
+    d = diff(
+        parse("$s = b {2XC}-> c; a {2XD}-> ($s, $s)"),
+        parse("$s = b {3XC}-> c; a {2XD}-> ($s, $s)")
+    )
+    assert d.changes == [Change(CHANGED, ["a", "[0]b"], "{2XC}", "{3XC}")]
+    assert d.layer_deltas() == [0, 0, 2]
+
+def test_deep():
+    chain = "a" + " -> b" * 3000
+    assert diff(parse(chain), parse(chain)).changes == []
+
+    changes = diff(parse(chain), parse(chain + " {2XC}-> b")).changes
+    assert [(c.kind, len(c.path)) for c in changes] == [(ADDED, 3001)]
@@ -0,0 +1,351 @@
+"""
+Expands a spec tree into flat per-node arrays, without building a graph.
+
+Expanded nodes are numbered exactly as `treespec.graph()` numbers them, so node
+ids are interchangeable between the two. All nodes of a layer are numbered
+consecutively, and the children of each node are consecutive within the next
+layer. As `graph()` visits each layer in reverse, the parent ids within each
+layer are non-increasing, so the descendants of any range of nodes in one layer
+are also a range of nodes in each later layer.
+"""
+
+from typing import Iterator, Optional
+import numpy as np
+
+import utils
+from treespec import Node, Relation
+
+# Edge colours, indexed by the values of `Expansion.colors`
+COLORS = ("black", "blue", "red")
+BLACK, BLUE, RED = range(len(COLORS))
+
+def relation_color(rel: Relation) -> int:
+    """Return the colour of the edges a relation produces, as in `graph()`."""
+
+    if rel.get_num() == 1:
+        return BLACK
+    elif rel.is_inclusive():
+        return BLUE
+    else:
+        return RED
+
+# Object Model
+# --------------------------------------------------
+
+class Expansion:
+    """
+    An expanded tree, as arrays indexed by node id.
+
+    - parents: The id of each node's parent (-1 for the root).
+    - label_ids: The index into `labels` of each node's label.
+    - colors: The colour (see `COLORS`) of the edge from each node's parent.
+    - layer_offsets: The id of the first node in each layer, followed by the
+      total number of nodes, ie. layer `i` is `layer_offsets[i]` (inclusive)
+      to `layer_offsets[i+1]` (exclusive).
+    - labels: The unique labels of the tree's nodes.
+    """
+
+    def __init__(self, parents, label_ids, colors, layer_offsets, labels):
+        self.parents = parents
+        self.label_ids = label_ids
+        self.colors = colors
+        self.layer_offsets = layer_offsets
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.parents)
+
+    def num_layers(self):
+        return len(self.layer_offsets) - 1
+
+    def layer(self, i):
+        """Return the range of ids of the nodes in the given layer."""
+        return range(self.layer_offsets[i], self.layer_offsets[i+1])
+
+    def layer_parents(self, i):
+        """
+        Return the parent of each node in the given layer, as an index into the
+        previous layer.
+        """
+        layer = self.layer(i)
+        return self.parents[layer.start:layer.stop] - self.layer_offsets[i-1]
+
+    def get_label(self, node_id):
+        return self.labels[self.label_ids[node_id]]
+
+    def find(self, label, layer=None):
+        """
+        Return the ids of the nodes with the given label, optionally only
+        those in the given layer.
+        """
+
+        if label not in self.labels:
+            return np.empty(0, dtype=np.int64)
+        label_id = self.labels.index(label)
+
+        if layer is None:
+            (start, stop) = (0, len(self))
+        else:
+            layer_ids = self.layer(layer)
+            (start, stop) = (layer_ids.start, layer_ids.stop)
+        return start + np.flatnonzero(self.label_ids[start:stop] == label_id)
+
+    def layer_of(self, node_id):
+        """Return the layer that the given node is in."""
+        return int(np.searchsorted(self.layer_offsets, node_id, side="right")) - 1
+
+    def child_range(self, start, stop, layer=None):
+        """
+        Return the range of ids of the children of the nodes with ids from
+        `start` (inclusive) to `stop` (exclusive), which must all be in the
+        same layer.
+        """
+
+        if layer is None:
+            layer = self.layer_of(start)
+        if layer + 1 >= self.num_layers() or start >= stop:
+            end = self.layer_offsets[min(layer + 1, self.num_layers())]
+            return range(end, end)
+
+        # Parent ids are non-increasing, so search them in reverse (as a view)
+        next_layer = self.layer(layer + 1)
+        rev_parents = self.parents[next_layer.start:next_layer.stop][::-1]
+        child_start = np.searchsorted(rev_parents, stop - 1, side="right")
+        child_stop = np.searchsorted(rev_parents, start - 1, side="right")
+        return range(
+            next_layer.stop - int(child_start),
+            next_layer.stop - int(child_stop)
+        )
+
+    def child_bounds(self, layer):
+        """
+        Return the child range bounds of every node in the given layer, such
+        that the children of the nodes at positions `i` to `j` (exclusive)
+        within the layer have ids from `bounds[j]` to `bounds[i]` (exclusive).
+        """
+
+        this_layer = self.layer(layer)
+        if layer + 1 >= self.num_layers():
+            end = self.layer_offsets[-1]
+            return np.full(len(this_layer) + 1, end, dtype=np.int64)
+
+        next_layer = self.layer(layer + 1)
+        counts = np.bincount(
+            self.parents[next_layer.start:next_layer.stop] - this_layer.start,
+            minlength=len(this_layer)
+        )
+
+        # Later nodes' children come first
+        bounds = np.zeros(len(this_layer) + 1, dtype=np.int64)
+        np.cumsum(counts[::-1], out=bounds[-2::-1])
+        return bounds + next_layer.start
+
+    def descendant_ranges(self, node_id, depth=None):
+        """
+        Return the range of ids, in each layer, of the given node and its
+        descendants, down to (but not including) `depth` layers below it.
+        """
+
+        layer = self.layer_of(node_id)
+        if depth is None:
+            depth = self.num_layers() - layer
+
+        ranges = [range(node_id, node_id + 1)]
+        for i in range(layer, min(layer + depth, self.num_layers()) - 1):
+            children = self.child_range(ranges[-1].start, ranges[-1].stop, i)
+            if len(children) == 0:
+                break
+            ranges.append(children)
+        return ranges
+
+    def subtree(self, node_id, depth=None):
+        """
+        Return the subtree rooted at the given node, down to (but not
+        including) `depth` layers below it, as a new `Expansion`.
+
+        Also returns the id in this expansion of each node in the subtree.
+        """
+
+        ranges = self.descendant_ranges(node_id, depth)
+        ids = np.concatenate([
+            np.arange(r.start, r.stop, dtype=np.int64) for r in ranges])
+
+        # Renumber the parents of each layer relative to the previous layer
+        parents = [np.full(1, -1, dtype=np.int64)]
+        layer_offsets = [0, 1]
+        for (prev, r) in zip(ranges, ranges[1:]):
+            parents.append(
+                self.parents[r.start:r.stop] - prev.start + layer_offsets[-2])
+            layer_offsets.append(layer_offsets[-1] + len(r))
+
+        subtree = Expansion(
+            np.concatenate(parents),
+            self.label_ids[ids],
+            self.colors[ids],
+            np.array(layer_offsets, dtype=np.int64),
+            self.labels
+        )
+        return (subtree, ids)
+
+# Spec Tables
+# --------------------------------------------------
+
+class _SpecTable:
+    """
+    The unique node specs of a spec tree, with their labels and children
+    flattened into arrays indexed by spec id (the root's spec id is 0).
+
+    The children of spec id `s` are
+    `children[child_offsets[s]:child_offsets[s+1]]`, in the order `graph()`
+    visits them, and `colors[s]` is the colour of the edges to them.
+    """
+
+    def __init__(self, spec: Node):
+        nodes = [spec]
+        spec_ids = {id(spec): 0}
+        labels = []
+        label_index = {}
+
+        label_ids = []
+        colors = []
+        child_offsets = [0]
+        children = []
+
+        # Nodes are appended as they're found, so this visits each unique node
+        # exactly once.
+        for node in nodes:
+            name = node.get_name()
+            if name not in label_index:
+                label_index[name] = len(labels)
+                labels.append(name)
+            label_ids.append(label_index[name])
+
+            rel = node.get_relation()
+            if rel is None:
+                next_nodes = []
+                colors.append(BLACK)
+            else:
+                next_nodes = rel.get_next()
+                if not utils.is_iterable(next_nodes):
+                    next_nodes = [next_nodes] * rel.get_num()
+                colors.append(relation_color(rel))
+
+            for next_node in next_nodes:
+                key = id(next_node)
+                if key not in spec_ids:
+                    spec_ids[key] = len(nodes)
+                    nodes.append(next_node)
+                children.append(spec_ids[key])
+            child_offsets.append(len(children))
+
+        self.nodes = nodes
+        self.labels = labels
+        self.label_ids = np.array(label_ids, dtype=np.int32)
+        self.colors = np.array(colors, dtype=np.uint8)
+        self.child_offsets = np.array(child_offsets, dtype=np.int64)
+        self.child_counts = np.diff(self.child_offsets)
+        self.children = np.array(children, dtype=np.int64)
+
+    def __getstate__(self):
+        # The node specs aren't needed to expand, so don't send them to other
+        # processes.
+        state = dict(self.__dict__)
+        state["nodes"] = None
+        return state
+
+    def subtree_sizes(self) -> list:
+        """
+        Return the number of nodes at each depth below each spec id, ie.
+        `sizes[k][s]` is the number of nodes `k` layers below spec id `s`.
+        """
+
+        owners = np.repeat(
+            np.arange(len(self.child_counts), dtype=np.int64), self.child_counts)
+        sizes = [np.ones(len(self.child_counts), dtype=np.int64)]
+        while True:
+            size = np.zeros(len(self.child_counts), dtype=np.int64)
+            np.add.at(size, owners, sizes[-1][self.children])
+            if not size.any():
+                break
+            sizes.append(size)
+        return sizes
+
+    def next_layer(self, spec_ids, ids):
+        """
+        Expand one layer, given the spec id and node id of each of its nodes.
+
+        Returns the spec id, parent node id, and edge colour of each node in
+        the next layer, in the order that `graph()` would number them.
+        """
+
+        # graph() visits each layer in reverse order
+        spec_ids = spec_ids[::-1]
+        ids = ids[::-1]
+
+        counts = self.child_counts[spec_ids]
+        total = int(counts.sum())
+        block_starts = np.cumsum(counts) - counts
+
+        within = np.arange(total, dtype=np.int64) - np.repeat(block_starts, counts)
+        next_spec_ids = self.children[
+            np.repeat(self.child_offsets[spec_ids], counts) + within]
+        parents = np.repeat(ids, counts)
+        colors = np.repeat(self.colors[spec_ids], counts)
+
+        return (next_spec_ids, parents, colors)
+
+# Expander
+# --------------------------------------------------
+
+def expand_layers(table: _SpecTable) -> Iterator[tuple]:
+    """
+    Expand the spec tree of the given table one layer at a time.
+
+    Yields the spec id, parent node id, and edge colour of each node in each
+    layer, from the root layer down.
+    """
+
+    spec_ids = np.zeros(1, dtype=np.int64)
+    parents = np.full(1, -1, dtype=np.int64)
+    colors = np.full(1, BLACK, dtype=np.uint8)
+
+    start = 0
+    while len(spec_ids) > 0:
+        yield (spec_ids, parents, colors)
+
+        ids = np.arange(start, start + len(spec_ids), dtype=np.int64)
+        start += len(spec_ids)
+        (spec_ids, parents, colors) = table.next_layer(spec_ids, ids)
+
+def expand(spec: Optional[Node]) -> Expansion:
+    """Expand the given spec tree into an `Expansion`."""
+
+    if spec is None:
+        return Expansion(
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.uint8),
+            np.zeros(1, dtype=np.int64),
+            []
+        )
+
+    table = _SpecTable(spec)
+
+    all_spec_ids = []
+    all_parents = []
+    all_colors = []
+    layer_offsets = [0]
+    for (spec_ids, parents, colors) in expand_layers(table):
+        all_spec_ids.append(spec_ids)
+        all_parents.append(parents)
+        all_colors.append(colors)
+        layer_offsets.append(layer_offsets[-1] + len(spec_ids))
+
+    spec_ids = np.concatenate(all_spec_ids)
+    return Expansion(
+        np.concatenate(all_parents),
+        table.label_ids[spec_ids],
+        np.concatenate(all_colors),
+        np.array(layer_offsets, dtype=np.int64),
+        table.labels
+    )
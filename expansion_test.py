@@ -0,0 +1,110 @@
+from expansion import *
+from treespec import parse, graph
+import re
+
+def graph_arrays(spec):
+    """Read the nodes and edges that graph() produces into arrays."""
+
+    labels = {}
+    parents = {}
+    colors = {}
+    for line in graph(spec).body:
+        edge = re.match(r"\s*(\d+) -> (\d+) \[color=(\w+)\]", line)
+        node = re.match(r"\s*(\d+) \[label=(\S+)\]", line)
+        if edge:
+            parents[int(edge[2])] = int(edge[1])
+            colors[int(edge[2])] = COLORS.index(edge[3])
+        elif node:
+            labels[int(node[1])] = node[2]
+
+    return (
+        [parents.get(i, -1) for i in range(len(labels))],
+        [labels[i] for i in range(len(labels))],
+        [colors.get(i, BLACK) for i in range(len(labels))]
+    )
+
+SPEC = "A -> B {2IC}-> C -> D {2XD}-> (E {3IC}-> F {2XC}-> G, E -> G)"
+
+def assert_same(a, b):
+    """Assert that two expansions have the same nodes, edges and labels."""
+
+    assert a.parents.tolist() == b.parents.tolist()
+    assert a.label_ids.tolist() == b.label_ids.tolist()
+    assert a.colors.tolist() == b.colors.tolist()
+    assert a.layer_offsets.tolist() == b.layer_offsets.tolist()
+    assert a.labels == b.labels
+
+def assert_matches_graph(spec_str):
+    spec = parse(spec_str)
+    expansion = expand(spec)
+    (parents, labels, colors) = graph_arrays(spec)
+
+    assert expansion.parents.tolist() == parents
+    assert [expansion.get_label(i) for i in range(len(expansion))] == labels
+    assert expansion.colors.tolist() == colors
+
+def test_expand_empty():
+    expansion = expand(parse(""))
+    assert len(expansion) == 0
+    assert expansion.num_layers() == 0
+
+def test_expand_one():
+    expansion = expand(parse("a"))
+    assert expansion.parents.tolist() == [-1]
+    assert expansion.layer_offsets.tolist() == [0, 1]
+
+def test_expand_consistent():
+    assert_matches_graph("A {3IC}-> B -> C {2XC}-> D -> E")
+
+def test_expand_divergent():
+    assert_matches_graph(
+        "A -> B {2IC}-> C -> D {2XD}-> (E {3IC}-> F {2XC}-> G, E -> GXX)")
+
+def test_expand_divergent_continuation():
+    assert_matches_graph("a {2XD}-> (b {2IC}-> x, c) -> d {3XC}-> e")
+
+def test_expand_macro():
+    assert_matches_graph("$s = b {2XC}-> c; a {3XD}-> ($s, d -> $s, $s)")
+
+def test_expand_layers():
+    expansion = expand(parse("A {3IC}-> B -> C {2XC}-> D"))
+    assert expansion.layer_offsets.tolist() == [0, 1, 4, 7, 13]
+    assert expansion.layer_parents(3).tolist() == [2, 2, 1, 1, 0, 0]
+
+def test_child_range():
+    expansion = expand(parse("a {3XD}-> (b {2XC}-> c, d, e {3IC}-> f)"))
+    assert list(expansion.child_range(0, 1)) == [1, 2, 3]
+    for node_id in range(1, 4):
+        children = expansion.child_range(node_id, node_id + 1)
+        assert (expansion.parents[children.start:children.stop] == node_id).all()
+        assert (
+            len(children) == (expansion.parents == node_id).sum())
+    assert len(expansion.child_range(4, 9)) == 0
+
+def test_child_bounds():
+    expansion = expand(parse("a {3XD}-> (b {2XC}-> c, d, e {3IC}-> f)"))
+    for layer in range(expansion.num_layers()):
+        this_layer = expansion.layer(layer)
+        bounds = expansion.child_bounds(layer)
+        for start in this_layer:
+            for stop in range(start, this_layer.stop + 1):
+                children = expansion.child_range(start, stop, layer)
+                (i, j) = (start - this_layer.start, stop - this_layer.start)
+                if len(children) > 0:
+                    assert (bounds[j], bounds[i]) == (
+                        children.start, children.stop)
+                else:
+                    assert bounds[j] == bounds[i]
+
+def test_subtree():
+    expansion = expand(parse("a {2XC}-> b {2IC}-> c {3XC}-> d"))
+    (subtree, ids) = expansion.subtree(2, 2)
+    assert len(subtree) == 3
+    assert subtree.parents.tolist() == [-1, 0, 0]
+    assert [subtree.get_label(i) for i in range(3)] == ["b", "c", "c"]
+    assert (expansion.parents[ids[1:]] == 2).all()
+
+    (subtree, ids) = expansion.subtree(1)
+    assert len(subtree) == 1 + 2 + 6
+    assert subtree.layer_offsets.tolist() == [0, 1, 3, 9]
+    assert (ids[subtree.parents[1:]] == expansion.parents[ids[1:]]).all()
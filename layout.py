@@ -0,0 +1,215 @@
+"""
+A native layered layout engine for expanded trees, for trees too large for
+graphviz to lay out.
+
+The layout is computed in linear time using whole-layer array operations. Like
+`treespec.graph()`, the root is drawn at the bottom, with each layer above the
+last. Each node is centred over its descendants, and each leaf gets its own
+column.
+"""
+
+from typing import Optional
+from xml.sax.saxutils import escape
+import numpy as np
+
+from treespec import Node
+from expansion import Expansion, COLORS, expand
+
+NODE_SEP = 60
+RANK_SEP = 60
+NODE_RX = 24
+NODE_RY = 14
+DASHED = ' stroke-dasharray="4,3"'
+
+# Layout
+# --------------------------------------------------
+
+def _display_positions(expansion: Expansion) -> tuple:
+    """
+    Return the left-to-right position of each node within its layer, and the
+    position of the first child of each node within the next layer.
+
+    The children of each node are consecutive within their layer, so placing
+    each block of siblings in the order of their parents' positions gives a
+    layout with no crossing edges.
+    """
+
+    if len(expansion) == 0:
+        return ([], [])
+
+    positions = [np.zeros(1, dtype=np.int64)]
+    all_block_starts = [None]
+    for i in range(1, expansion.num_layers()):
+        parents = expansion.layer_parents(i)
+        parent_positions = positions[-1]
+        num_parents = len(parent_positions)
+
+        # Where each parent's block of children starts, in display order
+        counts = np.bincount(parents, minlength=num_parents)
+        order = np.empty(num_parents, dtype=np.int64)
+        order[parent_positions] = np.arange(num_parents)
+        display_counts = counts[order]
+        block_starts = (np.cumsum(display_counts) - display_counts)[
+            parent_positions]
+
+        # Where each child is within its parent's block
+        first_children = np.empty(num_parents, dtype=np.int64)
+        starts = np.flatnonzero(np.r_[True, parents[1:] != parents[:-1]])
+        first_children[parents[starts]] = starts
+        within = np.arange(len(parents)) - first_children[parents]
+
+        positions.append(block_starts[parents] + within)
+        all_block_starts.append(block_starts)
+
+    return (positions, all_block_starts)
+
+def layout(expansion: Expansion) -> tuple:
+    """
+    Compute the coordinates of every node of the given expanded tree.
+
+    Returns the arrays `(x, y)`, indexed by node id, in SVG coordinates (ie. y
+    increases downwards).
+    """
+
+    num_layers = expansion.num_layers()
+    (positions, block_starts) = _display_positions(expansion)
+
+    # Bottom-up: the number of columns (leaves) under each node
+    widths = [None] * num_layers
+    for i in range(num_layers - 1, -1, -1):
+        layer = expansion.layer(i)
+        width = np.ones(len(layer), dtype=np.int64)
+        if i + 1 < num_layers:
+            parents = expansion.layer_parents(i + 1)
+            child_widths = np.bincount(
+                parents, weights=widths[i + 1], minlength=len(layer))
+            width = np.where(child_widths > 0, child_widths, 1).astype(np.int64)
+        widths[i] = width
+
+    # Top-down: the first column of each node is its parent's first column,
+    # plus the widths of the siblings before it.
+    lefts = [np.zeros(1, dtype=np.int64)] if num_layers > 0 else []
+    for i in range(1, num_layers):
+        parents = expansion.layer_parents(i)
+        pos = positions[i]
+
+        display_widths = np.empty(len(pos), dtype=np.int64)
+        display_widths[pos] = widths[i]
+        display_offsets = np.cumsum(display_widths) - display_widths
+        offsets = display_offsets[pos]
+
+        # Offset of the first child (in display order) of each child's parent
+        block_offsets = display_offsets[block_starts[i][parents]]
+
+        lefts.append(lefts[i-1][parents] + offsets - block_offsets)
+
+    if num_layers == 0:
+        return (np.empty(0), np.empty(0))
+
+    x = np.concatenate([
+        (left + width / 2) * NODE_SEP
+        for (left, width) in zip(lefts, widths)
+    ])
+    y = np.concatenate([
+        np.full(len(expansion.layer(i)), (num_layers - i - 0.5) * RANK_SEP)
+        for i in range(num_layers)
+    ])
+    return (x, y)
+
+# SVG Generator
+# --------------------------------------------------
+
+def svg(spec: Optional[Node]) -> str:
+    """
+    Lay out the given spec tree and return it as an SVG document.
+
+    Edges are coloured the same way as in `treespec.graph()`.
+    """
+
+    return svg_expansion(expand(spec))
+
+def svg_expansion(expansion: Expansion, links: Optional[dict] = None) -> str:
+    """
+    Lay out the given expanded tree and return it as an SVG document.
+
+    `links` optionally maps node ids to URLs. Those nodes are drawn dashed, as
+    links to the given URLs.
+    """
+
+    if links is None:
+        links = {}
+
+    (x, y) = layout(expansion)
+
+    if len(expansion) > 0:
+        (min_x, max_x) = (x.min() - NODE_SEP / 2, x.max() + NODE_SEP / 2)
+        (min_y, max_y) = (y.min() - RANK_SEP / 2, y.max() + RANK_SEP / 2)
+    else:
+        (min_x, max_x, min_y, max_y) = (0, 0, 0, 0)
+
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<svg xmlns="http://www.w3.org/2000/svg"'
+        f' viewBox="{min_x:g} {min_y:g} {max_x - min_x:g} {max_y - min_y:g}"'
+        f' width="{max_x - min_x:g}" height="{max_y - min_y:g}"'
+        ' font-family="Times,serif" font-size="14">',
+        '<defs>',
+    ]
+    for color in COLORS:
+        lines.append(
+            f'<marker id="arrow-{color}" viewBox="0 0 10 10" refX="10" refY="5"'
+            ' markerWidth="8" markerHeight="8" orient="auto-start-reverse">'
+            f'<path d="M0,0L10,5L0,10z" fill="{color}"/></marker>'
+        )
+    lines.append('</defs>')
+
+    # Edges (drawn first, so nodes are drawn over them)
+    edge_ids = np.flatnonzero(expansion.parents >= 0)
+    parents = expansion.parents[edge_ids]
+    lines.append('<g class="edges">')
+    for (x1, y1, x2, y2, color) in zip(
+        x[parents].tolist(), (y[parents] - NODE_RY).tolist(),
+        x[edge_ids].tolist(), (y[edge_ids] + NODE_RY).tolist(),
+        expansion.colors[edge_ids].tolist()
+    ):
+        color = COLORS[color]
+        lines.append(
+            f'<line x1="{x1:g}" y1="{y1:g}" x2="{x2:g}" y2="{y2:g}"'
+            f' stroke="{color}" marker-end="url(#arrow-{color})"/>'
+        )
+    lines.append('</g>')
+
+    # Nodes
+    labels = [escape(label) for label in expansion.labels]
+    lines.append('<g class="nodes">')
+    for (node_id, (cx, cy, label_id)) in enumerate(zip(
+        x.tolist(), y.tolist(), expansion.label_ids.tolist()
+    )):
+        node_svg = (
+            f'<g id="node{node_id}">'
+            f'<ellipse cx="{cx:g}" cy="{cy:g}" rx="{NODE_RX}" ry="{NODE_RY}"'
+            ' fill="white" stroke="black"'
+            f'{DASHED if node_id in links else ""}/>'
+            f'<text x="{cx:g}" y="{cy:g}" text-anchor="middle"'
+            f' dominant-baseline="central">{labels[label_id]}</text></g>'
+        )
+        if node_id in links:
+            href = escape(links[node_id], {'"': "&quot;"})
+            node_svg = f'<a href="{href}">{node_svg}</a>'
+        lines.append(node_svg)
+    lines.append('</g>')
+
+    lines.append('</svg>')
+    return "\n".join(lines) + "\n"
+
+def render(spec: Optional[Node], filename: str = "graph") -> str:
+    """
+    Lay out the given spec tree and write it to `<filename>.svg`.
+
+    Returns the path of the written file.
+    """
+
+    path = filename + ".svg"
+    with open(path, "w") as f:
+        f.write(svg(spec))
+    return path
@@ -0,0 +1,53 @@
+from layout import *
+from treespec import parse
+import xml.etree.ElementTree as ET
+
+def test_layout_empty():
+    (x, y) = layout(expand(parse("")))
+    assert len(x) == 0 and len(y) == 0
+
+def test_layout_layers():
+    expansion = expand(parse("a {2XC}-> b {3IC}-> c"))
+    (x, y) = layout(expansion)
+
+    # Root at the bottom, one row per layer
+    for i in range(expansion.num_layers()):
+        layer = expansion.layer(i)
+        assert len(set(y[layer.start:layer.stop])) == 1
+    assert y[0] > y[1] > y[3]
+
+    # Leaves get a column each, and parents are centred over their children
+    leaves = sorted(x[3:])
+    assert leaves == [NODE_SEP * (i + 0.5) for i in range(6)]
+    for i in range(1, 3):
+        children = expansion.parents == i
+        assert x[i] == x[children].mean()
+
+def test_layout_no_crossings():
+    expansion = expand(parse(
+        "a {3XD}-> (b {2XC}-> c, d, e {3IC}-> f {2XD}-> (g, h -> i))"))
+    (x, y) = layout(expansion)
+
+    # Along each layer, parents of the next layer are in the same order
+    for i in range(1, expansion.num_layers()):
+        layer = expansion.layer(i)
+        ids = np.arange(layer.start, layer.stop)
+        ordered = ids[np.argsort(x[ids])]
+        parent_x = x[expansion.parents[ordered]]
+        assert (np.diff(parent_x) >= 0).all()
+
+def test_layout_no_overlaps():
+    expansion = expand(parse("a {3XD}-> (b {2XC}-> c, d, e {3IC}-> f)"))
+    (x, y) = layout(expansion)
+    points = set(zip(x.tolist(), y.tolist()))
+    assert len(points) == len(expansion)
+
+def test_svg():
+    root = ET.fromstring(svg(parse("a {2XC}-> b -> c {2IC}-> d")))
+    ns = {"svg": "http://www.w3.org/2000/svg"}
+    assert len(root.findall(".//svg:ellipse", ns)) == 9
+    strokes = [line.get("stroke") for line in root.findall(".//svg:line", ns)]
+    assert sorted(strokes) == ["black"] * 2 + ["blue"] * 4 + ["red"] * 2
+
+def test_svg_escapes_labels():
+    ET.fromstring(svg(parse("a<b> -> c&d")))
@@ -0,0 +1,592 @@
+"""
+Validates and lints Tree Spec Language (TSL) specs.
+
+Unlike `treespec.parse()`, which stops at the first error (often without saying
+where it is), the linter scans a spec once, from start to end, and reports
+every problem it finds with its line and column. It reports as errors the
+problems that `parse()` would reject (splitting definitions exactly as it does,
+even around unmatched brackets), and as warnings things that `parse()` accepts
+but that are probably mistakes (eg. text it silently ignores).
+
+The linter is stricter than `parse()` in two ways: stray `{`s and `}`s, and
+malformed relation specs that no `->` follows, are errors, though `parse()`
+ignores them; and relation spec nums must be ASCII digits, though `parse()`
+accepts any that `int()` does.
+
+If a spec has no errors, it also warns if the tree it expands into would be
+larger than the given thresholds. The size of each layer of the expanded tree
+is computed from the relations' `num`s, as `treespec.layer_sizes()` does, but
+from the structure found while scanning, without parsing the spec again.
+"""
+
+import sys
+import argparse
+import bisect
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from treespec import MACRO_PREFIX
+
+ERROR = "error"
+WARNING = "warning"
+
+# Default thresholds for the size of the expanded tree
+MAX_NODES = 1_000_000
+MAX_WIDTH = 100_000
+MAX_DEPTH = 1_000
+
+# Object Model
+# --------------------------------------------------
+
+class Diagnostic:
+    """An error or warning, at a (1-based) line and column of a spec."""
+
+    def __init__(self, severity, message, line, column, path=None):
+        self.severity = severity
+        self.message = message
+        self.line = line
+        self.column = column
+        self.path = path
+
+    def __repr__(self):
+        return (
+            f"Diagnostic({self.severity!r}, {self.message!r},"
+            f" {self.line}, {self.column})"
+        )
+
+    def __str__(self):
+        location = f"{self.line}:{self.column}"
+        if self.path is not None:
+            location = f"{self.path}:{location}"
+        return f"{location}: {self.severity}: {self.message}"
+
+# Scanner
+# --------------------------------------------------
+
+def _strip(spec_str):
+    """
+    Remove unescaped whitespace, as `parse()` does, returning the stripped
+    spec and the offset in the original spec of each character in it.
+    """
+
+    chars = []
+    offsets = []
+    escapes = {" ": " ", "s": " ", "t": "\t", "n": "\n"}
+
+    i = 0
+    while i < len(spec_str):
+        c = spec_str[i]
+        if c == "\\" and spec_str[i+1:i+2] in escapes:
+            chars.append(escapes[spec_str[i+1]])
+            offsets.append(i)
+            i += 2
+            continue
+        if c not in " \t\n":
+            chars.append(c)
+            offsets.append(i)
+        i += 1
+
+    offsets.append(len(spec_str))
+    return ("".join(chars), offsets)
+
+class _Linter:
+    def __init__(self, spec_str):
+        self.spec_str = spec_str
+        (self.s, self.offsets) = _strip(spec_str)
+        self.line_starts = [0] + [
+            i + 1 for (i, c) in enumerate(spec_str) if c == "\n"]
+        self.diagnostics = []
+        self.scan_brackets()
+
+        # Name -> [position of each reference]
+        self.references = {}
+
+        # The names referenced by the definition being linted (if any)
+        self.def_references = None
+
+        # The children (as `(node id, copies)`) of each node, and the name of
+        # the definition that each reference node refers to
+        self.children = []
+        self.aliases = {}
+
+    def report(self, severity, message, pos):
+        offset = self.offsets[min(pos, len(self.s))]
+        line = bisect.bisect_right(self.line_starts, offset)
+        column = offset - self.line_starts[line - 1] + 1
+        self.diagnostics.append(Diagnostic(severity, message, line, column))
+
+    def scan_brackets(self):
+        """
+        Find the matching `)` and the top-level `,`s of each `(`, and the
+        top-level `;`s, in one pass.
+        """
+
+        self.closes = {}
+        self.commas = {}
+        semicolons = []
+        all_opens = []
+
+        opens = []
+        for (i, c) in enumerate(self.s):
+            if c == "(":
+                opens.append(i)
+                all_opens.append(i)
+                self.commas[i] = []
+            elif c == ")":
+                if len(opens) > 0:
+                    self.closes[opens.pop()] = i
+            elif c == "," and len(opens) > 0:
+                self.commas[opens[-1]].append(i)
+            elif c == ";":
+                semicolons.append(i)
+
+        # As in `utils.split_top_level()`, only the first `(` after each split
+        # point can nest `;`s, and only if it has a matching `)`.
+        self.semicolons = []
+        pos = 0
+        while True:
+            next_semicolon = bisect.bisect_left(semicolons, pos)
+            if next_semicolon == len(semicolons):
+                break
+            semicolon = semicolons[next_semicolon]
+
+            next_open = bisect.bisect_left(all_opens, pos)
+            if next_open < len(all_opens):
+                open_pos = all_opens[next_open]
+                if open_pos < semicolon and open_pos in self.closes:
+                    pos = self.closes[open_pos] + 1
+                    continue
+
+            self.semicolons.append(semicolon)
+            pos = semicolon + 1
+
+    def split(self, start, end, delims):
+        """Return the bounds of each part of s[start:end], split at delims."""
+
+        bounds = [start] + [i + 1 for i in delims] + [end + 1]
+        return [(a, b - 1) for (a, b) in zip(bounds, bounds[1:])]
+
+    def arrow(self, start, end):
+        """Return the position of the next `->` in s[start:end], if any."""
+
+        i = self.s.find("->", start, end)
+        return None if i < 0 else i
+
+    # Grammar
+    # ----------
+
+    def spec(self):
+        """
+        Lint the whole spec, returning the definitions it contains, and the
+        id of its root node (if any).
+        """
+
+        parts = self.split(0, len(self.s), self.semicolons)
+        defs = {}
+        for (start, end) in parts[:-1]:
+            self.definition(start, end, defs)
+
+        (start, end) = parts[-1]
+        (root, _, _) = self.chain(start, end, in_branch=False)
+        return (defs, root)
+
+    def definition(self, start, end, defs):
+        eq = self.s.find("=", start, end)
+        if eq < 0:
+            self.report(ERROR, "subtree definition has no '='", start)
+            return
+
+        name = self.s[start:eq]
+        if not name.startswith(MACRO_PREFIX) or name == MACRO_PREFIX:
+            self.report(
+                ERROR,
+                f"subtree definition names must start with '{MACRO_PREFIX}'"
+                " and cannot be blank",
+                start
+            )
+            return
+        if name in defs:
+            self.report(
+                ERROR, f"subtree '{name}' is defined more than once", start)
+            return
+        if eq + 1 == end:
+            self.report(ERROR, f"subtree '{name}' cannot be blank", eq + 1)
+
+        self.def_references = set()
+        (root, _, _) = self.chain(eq + 1, end, in_branch=False)
+        defs[name] = (start, self.def_references, root)
+        self.def_references = None
+
+    def chain(self, start, end, in_branch):
+        """
+        Lint a chain of node and branch specs.
+
+        Returns the id of its root node (if any), the ids of the nodes at its
+        end, and whether it ends in a reference to a subtree definition (ie.
+        nothing can follow it).
+        """
+
+        if start == end:
+            if in_branch:
+                self.report(ERROR, "branch members cannot be blank", start)
+            return (None, [], False)
+
+        (root, shared, rel_spec, pos) = self.node(start, end)
+        ends = [root]
+        while pos is not None:
+            if rel_spec is None:
+                (struct, num) = ("C", 1)
+            else:
+                (struct, num) = rel_spec
+
+            if pos == end:
+                if rel_spec is not None:
+                    self.report(ERROR, "relation spec without relation", pos)
+                else:
+                    self.report(ERROR, "missing node after '->'", pos)
+                return (root, ends, shared)
+            if shared:
+                self.report(
+                    ERROR,
+                    "cannot relate from a shared subtree, as it may be"
+                    " referenced from elsewhere",
+                    pos
+                )
+
+            if struct == "D":
+                (next_nodes, next_ends, shared, rel_spec, pos) = self.branch(
+                    pos, end, num)
+                copies = 1
+            else:
+                if self.s[pos] == "(":
+                    self.report(
+                        WARNING,
+                        "branch spec after a consistent relation is treated as"
+                        " a node name (did you mean to use a 'D' relation?)",
+                        pos
+                    )
+                (next_node, shared, rel_spec, pos) = self.node(pos, end)
+                (next_nodes, next_ends) = ([next_node], [next_node])
+                copies = num
+
+            for node_id in ends:
+                self.children[node_id] = [
+                    (next_node, copies) for next_node in next_nodes]
+            ends = next_ends
+
+        if rel_spec is not None:
+            self.report(
+                WARNING, "relation spec without relation is ignored", end)
+        return (root, ends, shared)
+
+    def node(self, start, end):
+        """
+        Lint a node spec, and its relation spec (if any).
+
+        Returns the node's id, whether the node spec is a reference, the
+        relation spec's `(struct, num)` (if any), and the position after the
+        next `->` (if any).
+        """
+
+        arrow = self.arrow(start, end)
+        part_end = end if arrow is None else arrow
+        next_pos = None if arrow is None else arrow + 2
+
+        brace = self.s.find("{", start, part_end)
+        name_end = part_end if brace < 0 else brace
+        name = self.s[start:name_end]
+
+        close = self.s.find("}", start, part_end)
+        if brace < 0 and close >= 0:
+            self.report(ERROR, "'}' without '{'", close)
+
+        node_id = len(self.children)
+        self.children.append([])
+
+        if name == "":
+            self.report(ERROR, "node names cannot be blank", start)
+        elif name.startswith(MACRO_PREFIX):
+            self.aliases[node_id] = name
+            self.references.setdefault(name, []).append(start)
+            if self.def_references is not None:
+                self.def_references.add(name)
+
+        rel_spec = None
+        if brace >= 0:
+            rel_spec = self.rel_spec(brace, part_end)
+
+        return (node_id, name.startswith(MACRO_PREFIX), rel_spec, next_pos)
+
+    def branch(self, start, end, num):
+        """
+        Lint a branch spec, and its relation spec (if any).
+
+        Returns the ids of the roots of its members, the ids of the nodes at
+        the ends of its members, whether any member ends in a reference, the
+        relation spec's `(struct, num)` (if any), and the position after the
+        next `->` (if any).
+        """
+
+        if self.s[start] != "(":
+            self.report(
+                ERROR, "divergent relation must be followed by a branch spec",
+                start)
+            (node_id, shared, rel_spec, next_pos) = self.node(start, end)
+            return ([node_id], [node_id], shared, rel_spec, next_pos)
+
+        close = self.closes.get(start)
+        if close is None or close >= end:
+            self.report(ERROR, "unclosed '('", start)
+            return ([], [], False, None, None)
+
+        members = self.split(start + 1, close, self.commas[start])
+        roots = []
+        ends = []
+        shared = False
+        for (member_start, member_end) in members:
+            (root, member_ends, member_shared) = self.chain(
+                member_start, member_end, in_branch=True)
+            if root is not None:
+                roots.append(root)
+            ends.extend(member_ends)
+            shared = shared or member_shared
+        if num is not None and num != len(members):
+            self.report(
+                WARNING,
+                f"branch spec has {len(members)} members, but its relation"
+                f" spec's num is {num}",
+                start
+            )
+
+        arrow = self.arrow(close + 1, end)
+        part_end = end if arrow is None else arrow
+        next_pos = None if arrow is None else arrow + 2
+
+        rel_spec = None
+        brace = self.s.find("{", close + 1, part_end)
+        if brace < 0:
+            close_brace = self.s.find("}", close + 1, part_end)
+            if close_brace >= 0:
+                self.report(ERROR, "'}' without '{'", close_brace)
+            elif close + 1 < part_end:
+                self.report(
+                    WARNING, "text after branch spec is ignored", close + 1)
+        else:
+            if brace > close + 1:
+                self.report(
+                    WARNING, "text after branch spec is ignored", close + 1)
+            rel_spec = self.rel_spec(brace, part_end)
+
+        return (roots, ends, shared, rel_spec, next_pos)
+
+    def rel_spec(self, brace, part_end):
+        """
+        Lint the relation spec starting at the given `{`, returning its
+        `(struct, num)`, or None if it's invalid.
+        """
+
+        close = self.s.find("}", brace, part_end)
+        if close < 0:
+            self.report(ERROR, "incomplete relation spec (missing '}')", brace)
+            return None
+        if close + 1 < part_end:
+            self.report(
+                WARNING, "text after relation spec is ignored", close + 1)
+
+        content = self.s[brace + 1:close]
+        if len(content) != 3:
+            self.report(
+                ERROR,
+                f"relation spec '{{{content}}}' must be <num><combo><branch>,"
+                " eg. {2XC}",
+                brace
+            )
+            return None
+
+        (num, combo, struct) = content
+        valid = True
+        if num not in "0123456789":
+            self.report(ERROR, f"relation spec num must be 0-9, not '{num}'",
+                brace + 1)
+            valid = False
+        elif num == "0":
+            self.report(
+                WARNING, "relation spec num is 0, so no nodes follow", brace + 1)
+        if combo not in "XI":
+            self.report(
+                ERROR, f"relation spec combo must be X or I, not '{combo}'",
+                brace + 2)
+            valid = False
+        if struct not in "CD":
+            self.report(
+                ERROR, f"relation spec branch must be C or D, not '{struct}'",
+                brace + 3)
+            valid = False
+
+        return (struct, int(num)) if valid else None
+
+    # Definitions
+    # ----------
+
+    def check_definitions(self, defs):
+        for (name, positions) in self.references.items():
+            if name not in defs:
+                for pos in positions:
+                    self.report(ERROR, f"undefined subtree '{name}'", pos)
+
+        for (name, (pos, _, _)) in defs.items():
+            if name not in self.references:
+                self.report(WARNING, f"subtree '{name}' is never used", pos)
+
+        # Depth-first search for cycles
+        state = {}
+        def visit(name, path):
+            state[name] = "visiting"
+            for ref in sorted(defs[name][1]):
+                if ref not in defs:
+                    continue
+                if state.get(ref) == "visiting":
+                    cycle = " -> ".join(path[path.index(ref):] + [ref])
+                    self.report(
+                        ERROR,
+                        f"subtree '{ref}' references itself ({cycle})",
+                        defs[ref][0]
+                    )
+                elif ref not in state:
+                    visit(ref, path + [ref])
+            state[name] = "done"
+
+        for name in defs:
+            if name not in state:
+                visit(name, [name])
+
+    # Sizes
+    # ----------
+
+    def layer_sizes(self, defs, root):
+        """
+        Return the number of nodes in each layer of the expanded tree, as
+        `treespec.layer_sizes()` does. The spec must have no errors.
+        """
+
+        def resolve(node_id):
+            while node_id in self.aliases:
+                node_id = defs[self.aliases[node_id]][2]
+            return node_id
+
+        if root is None:
+            return []
+
+        sizes = []
+        layer = {resolve(root): 1}
+        while len(layer) > 0:
+            sizes.append(sum(layer.values()))
+
+            next_layer = {}
+            for (node_id, count) in layer.items():
+                for (child, copies) in self.children[node_id]:
+                    child = resolve(child)
+                    next_layer[child] = next_layer.get(child, 0) + count * copies
+            layer = next_layer
+
+        return sizes
+
+# Linter
+# --------------------------------------------------
+
+def lint(
+    spec_str: str,
+    max_nodes: Optional[int] = MAX_NODES,
+    max_width: Optional[int] = MAX_WIDTH,
+    max_depth: Optional[int] = MAX_DEPTH
+) -> list:
+    """
+    Return every error and warning in the given spec string, in order of
+    position.
+
+    Thresholds that are None aren't checked.
+    """
+
+    linter = _Linter(spec_str)
+    (defs, root) = linter.spec()
+    linter.check_definitions(defs)
+
+    if not any(d.severity == ERROR for d in linter.diagnostics):
+        sizes = linter.layer_sizes(defs, root)
+        for (value, threshold, description) in (
+            (sum(sizes), max_nodes, "nodes"),
+            (max(sizes, default=0), max_width, "nodes in its widest layer"),
+            (len(sizes), max_depth, "layers"),
+        ):
+            if threshold is not None and value > threshold:
+                linter.report(
+                    WARNING,
+                    f"expanded tree has {value} {description}"
+                    f" (more than {threshold})",
+                    0
+                )
+
+    return sorted(
+        linter.diagnostics, key=lambda d: (d.line, d.column, d.severity))
+
+def lint_file(path: str, **thresholds) -> list:
+    """Return every error and warning in the given spec file."""
+
+    with open(path, "rb") as spec_file:
+        data = spec_file.read()
+    try:
+        spec_str = data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        line = data.count(b"\n", 0, e.start) + 1
+        column = e.start - data.rfind(b"\n", 0, e.start)
+        return [Diagnostic(
+            ERROR, f"spec file is not valid UTF-8 ({e.reason})",
+            line, column, path)]
+
+    # Translate newlines, as reading in text mode would
+    spec_str = spec_str.replace("\r\n", "\n").replace("\r", "\n")
+
+    diagnostics = lint(spec_str, **thresholds)
+    for diagnostic in diagnostics:
+        diagnostic.path = path
+    return diagnostics
+
+def _lint_file(args):
+    # One file's failure mustn't stop the others from being checked
+    (path, thresholds) = args
+    try:
+        return lint_file(path, **thresholds)
+    except OSError as e:
+        return [Diagnostic(ERROR, str(e), 1, 1, path)]
+    except Exception as e:
+        return [Diagnostic(
+            ERROR, f"linter failed: {type(e).__name__}: {e}", 1, 1, path)]
+
+# Direct Usage
+# --------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check TSL spec files for errors and warnings.")
+    parser.add_argument("paths", nargs="+", metavar="spec_file")
+    parser.add_argument("--max-nodes", type=int, default=MAX_NODES)
+    parser.add_argument("--max-width", type=int, default=MAX_WIDTH)
+    parser.add_argument("--max-depth", type=int, default=MAX_DEPTH)
+    parser.add_argument("--jobs", type=int, default=None,
+        help="number of files to check in parallel (default: one per CPU)")
+    args = parser.parse_args()
+
+    thresholds = {
+        "max_nodes": args.max_nodes,
+        "max_width": args.max_width,
+        "max_depth": args.max_depth,
+    }
+    failed = False
+    with ProcessPoolExecutor(args.jobs) as executor:
+        jobs = [(path, thresholds) for path in args.paths]
+        for diagnostics in executor.map(_lint_file, jobs, chunksize=16):
+            for diagnostic in diagnostics:
+                print(diagnostic)
+                failed = failed or diagnostic.severity == ERROR
+
+    sys.exit(1 if failed else 0)
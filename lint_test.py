@@ -0,0 +1,172 @@
+from lint import *
+from lint import _Linter
+import lint as lint_module
+from treespec import parse, layer_sizes
+import os
+import subprocess
+import sys
+import pytest
+
+LINT_PATH = os.path.join(os.path.dirname(__file__), "lint.py")
+
+def errors(spec_str):
+    return [
+        (d.line, d.column) for d in lint(spec_str) if d.severity == ERROR]
+
+def warnings(spec_str, **thresholds):
+    return [
+        d.message for d in lint(spec_str, **thresholds)
+        if d.severity == WARNING]
+
+VALID = [
+    "",
+    "a",
+    "a->b",
+    "a{1XC}->b",
+    "L0 {3IC}-> L1 -> L2 {2XC}-> L3 -> L4",
+    "L0 -> L1 {2ID}-> (L2 -> L3, L2 {2ID}-> (L3 -> L4, L3 -> L4 {2XC}-> L5))",
+    "a {2XD}-> (b, c) -> d",
+    "$s = b {2XC}-> c; a {2XD}-> ($s, $s)",
+    "$t = c; $s = b -> $t; a -> $s",
+    "a\\ b -> c",
+    "$t=($t={3ID}$s={2XD}(;)",
+]
+
+INVALID = [
+    "->",
+    "a->",
+    "->a",
+    "a{1}->b",
+    "a{1IC->b",
+    "a{1IC->b{1IC}->c",
+    "a{2QC}->b",
+    "a{xXC}->b",
+    "a{2XC}->",
+    "a {2XD}-> b",
+    "a {2XD}-> (b, c",
+    "(c;",
+    "b ((;)",
+    "a{²XC}->b",
+    "a -> (b; c",
+    "a -> $s",
+    "$s = b; $s = c; a -> $s",
+    "$s = b -> $t; $t = c -> $s; a -> $s",
+    "$s = b -> $s; a",
+    "$s = b; a -> $s -> c",
+    "$s = b; a {2XD}-> ($s, c) -> d",
+    "s = b; a",
+]
+
+def test_valid_agrees_with_parse():
+    for spec_str in VALID:
+        parse(spec_str)
+        assert errors(spec_str) == [], spec_str
+
+def test_invalid_agrees_with_parse():
+    for spec_str in INVALID:
+        with pytest.raises(ValueError):
+            parse(spec_str)
+        assert errors(spec_str) != [], spec_str
+
+# Stray braces, and malformed relation specs that no `->` follows, which
+# `parse()` ignores, and non-ASCII digits, which `int()` accepts.
+STRICTER = [
+    "{",
+    "}",
+    "a{2X}",
+    "a -> b{{2XC}",
+    "a{٣XC}->b",
+]
+
+def test_stricter_than_parse():
+    for spec_str in STRICTER:
+        parse(spec_str)
+        assert errors(spec_str) != [], spec_str
+
+def test_f_blank_branch_member():
+    assert errors("a {2XD}-> (b, )") == [(1, 15)]
+
+def test_f_bad_rel_spec_hangs_parse():
+    # parse() never terminates on these, so only the linter can report them
+    assert errors("a {2XE}-> b") == [(1, 6)]
+
+def test_error_positions():
+    assert errors("a ->\n  b {2QC}->\n  c") == [(2, 7)]
+    assert errors("$s = b;\na -> $t") == [(2, 6)]
+    assert errors("a {2XD}-> (b, c") == [(1, 11)]
+
+def test_reports_every_error():
+    assert errors("a {2QC}-> b {xXC}-> c -> $u") == [(1, 5), (1, 14), (1, 26)]
+
+def test_warnings():
+    assert warnings("a {2XD}-> (b, c, d)") == [
+        "branch spec has 3 members, but its relation spec's num is 2"]
+    assert warnings("a -> (b, c)") == [
+        "branch spec after a consistent relation is treated as a node name"
+        " (did you mean to use a 'D' relation?)"]
+    assert warnings("a {2XC}junk -> b") == [
+        "text after relation spec is ignored"]
+    assert warnings("$s = b; a") == ["subtree '$s' is never used"]
+    assert warnings("a {2XC}") == ["relation spec without relation is ignored"]
+
+def test_size_warnings():
+    spec_str = "a {9XC}-> b {9XC}-> c {9XC}-> d"
+    assert warnings(spec_str) == []
+    assert warnings(spec_str, max_nodes=100) == [
+        "expanded tree has 820 nodes (more than 100)"]
+    assert warnings(spec_str, max_width=700) == [
+        "expanded tree has 729 nodes in its widest layer (more than 700)"]
+    assert warnings(spec_str, max_depth=3) == [
+        "expanded tree has 4 layers (more than 3)"]
+
+def test_cli(tmp_path):
+    (tmp_path / "good.tsl").write_text("a -> b")
+    (tmp_path / "bad.tsl").write_text("a ->\n  b {2QC}-> c")
+    result = subprocess.run(
+        [sys.executable, LINT_PATH, str(tmp_path / "good.tsl"),
+            str(tmp_path / "bad.tsl"), "--jobs", "2"],
+        capture_output=True, text=True
+    )
+    assert result.returncode == 1
+    assert result.stdout == (
+        f"{tmp_path / 'bad.tsl'}:2:7: error:"
+        " relation spec combo must be X or I, not 'Q'\n")
+
+def test_lint_file_not_utf8(tmp_path):
+    (tmp_path / "bad.tsl").write_bytes(b"a -> b\r\nc\xff -> d")
+    [diagnostic] = lint_file(str(tmp_path / "bad.tsl"))
+    assert (diagnostic.severity, diagnostic.line, diagnostic.column) == (
+        ERROR, 2, 2)
+
+def test_cli_continues_after_failure(tmp_path):
+    (tmp_path / "a.tsl").write_bytes(b"\xff")
+    (tmp_path / "b.tsl").write_text("a{2QC}->b")
+    result = subprocess.run(
+        [sys.executable, LINT_PATH, str(tmp_path / "a.tsl"),
+            str(tmp_path / "missing.tsl"), str(tmp_path / "b.tsl")],
+        capture_output=True, text=True
+    )
+    assert result.returncode == 1
+    lines = result.stdout.splitlines()
+    assert len(lines) == 3
+    assert lines[0].startswith(f"{tmp_path / 'a.tsl'}:1:1: error:")
+    assert lines[1].startswith(f"{tmp_path / 'missing.tsl'}:1:1: error:")
+    assert lines[2].startswith(f"{tmp_path / 'b.tsl'}:1:4: error:")
+
+def test_lint_file_failure_is_reported(tmp_path, monkeypatch):
+    def fail(spec_str, **thresholds):
+        raise RuntimeError("oops")
+    monkeypatch.setattr(lint_module, "lint", fail)
+
+    (tmp_path / "a.tsl").write_text("a")
+    [diagnostic] = lint_module._lint_file((str(tmp_path / "a.tsl"), {}))
+    assert diagnostic.severity == ERROR
+    assert "oops" in diagnostic.message
+
+def test_sizes_agree_with_layer_sizes():
+    for spec_str in VALID + [
+        "A -> B {2IC}-> C -> D {2XD}-> (E {3IC}-> F {2XC}-> G, E -> GXX)",
+        "$s = b {3XC}-> c; $t = $s; a {2XD}-> ($t, x {2IC}-> $s)",
+    ]:
+        linter = _Linter(spec_str)
+        assert linter.layer_sizes(*linter.spec()) == layer_sizes(parse(spec_str))
@@ -0,0 +1,205 @@
+"""
+Expands huge trees using several processes.
+
+The tree is expanded as normal down to a chosen layer, then the nodes of that
+layer are split into contiguous ranges (partitions) of roughly equal total
+subtree size, and each partition's descendants are expanded by a separate
+worker process. Every partition's descendants are a contiguous range of ids in
+each later layer, and the size of each range is known from the spec tree in
+advance, so each worker writes its nodes directly into their final place,
+numbered exactly as `expansion.expand()` (and `graph()`) would.
+
+Workers write into a memory-mapped tree store (see `store.py`): either one at a
+given path, or a temporary one in shared memory (where available), which is
+deleted as soon as it's mapped, and so is freed once the returned arrays are.
+"""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import numpy as np
+
+from treespec import Node
+from expansion import Expansion, BLACK, _SpecTable
+import expansion
+import store
+
+# Where temporary stores are created (None for the default temporary directory)
+TEMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Partitioning
+# --------------------------------------------------
+
+def _choose_layer(sizes: list, partitions: int) -> int:
+    """
+    Return the shallowest layer with enough nodes to partition well (or the
+    last layer, if there isn't one).
+    """
+
+    for (layer, size) in enumerate(sizes):
+        if size >= 4 * partitions:
+            return layer
+    return len(sizes) - 1
+
+def _partition(weights: np.ndarray, partitions: int) -> list:
+    """
+    Split the nodes of a layer into at most `partitions` contiguous ranges with
+    roughly equal total weights.
+    """
+
+    cumulative = np.cumsum(weights)
+    targets = cumulative[-1] * np.arange(1, partitions) / partitions
+    cuts = np.unique(np.searchsorted(cumulative, targets) + 1)
+    bounds = [0] + [int(cut) for cut in cuts if 0 < cut < len(weights)]
+    bounds.append(len(weights))
+    return list(zip(bounds, bounds[1:]))
+
+# Workers
+# --------------------------------------------------
+
+def _expand_partition(args):
+    """
+    Expand the descendants of one partition into the store at the given path,
+    where `block_starts[k]` is the id of the partition's first node `k` layers
+    below the partition layer.
+    """
+
+    (table, spec_ids, block_starts, path) = args
+    tree = store._open(path, "r+")
+
+    ids = np.arange(
+        block_starts[0], block_starts[0] + len(spec_ids), dtype=np.int64)
+    for start in block_starts[1:]:
+        (spec_ids, layer_parents, layer_colors) = table.next_layer(
+            spec_ids, ids)
+        stop = start + len(spec_ids)
+
+        tree.parents[start:stop] = layer_parents
+        tree.label_ids[start:stop] = table.label_ids[spec_ids]
+        tree.colors[start:stop] = layer_colors
+        ids = np.arange(start, stop, dtype=np.int64)
+
+    for array in (tree.parents, tree.label_ids, tree.colors):
+        if isinstance(array, np.memmap):
+            array.flush()
+
+# Expander
+# --------------------------------------------------
+
+def expand(
+    spec: Optional[Node],
+    partitions: Optional[int] = None,
+    layer: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    path: Optional[str] = None
+) -> Expansion:
+    """
+    Expand the given spec tree into an `Expansion`, using several processes.
+
+    The tree is partitioned at the given layer (by default, the shallowest
+    layer with a few nodes per partition) into (at most) `partitions`
+    partitions (by default, one per worker process).
+
+    If a path is given, the tree is expanded into a store at that path, and
+    the store is returned opened read-only (as by `store.open_store()`).
+    Otherwise, the returned arrays are writable, and backed by a temporary
+    store.
+    """
+
+    if spec is None:
+        if path is None:
+            return expansion.expand(spec)
+        store.write_spec(spec, path)
+        return store.open_store(path)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if partitions is None:
+        partitions = max_workers
+
+    table = _SpecTable(spec)
+    sizes_below = table.subtree_sizes()
+    sizes = [int(size[0]) for size in sizes_below]
+    layer_offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    total = int(layer_offsets[-1])
+
+    if layer is None:
+        layer = _choose_layer(sizes, partitions)
+    if not 0 <= layer < len(sizes):
+        raise ValueError(
+            f"partition layer must be from 0 to {len(sizes) - 1}, not: {layer}")
+
+    if path is None:
+        (fd, out_path) = tempfile.mkstemp(suffix=".tsx", dir=TEMP_DIR)
+        os.close(fd)
+    else:
+        out_path = path
+
+    try:
+        (parents, label_ids, colors) = store._create(
+            out_path, total, layer_offsets, table.labels)
+
+        # Expand down to the partition layer here
+        spec_ids = np.zeros(1, dtype=np.int64)
+        parents[0] = -1
+        label_ids[0] = table.label_ids[0]
+        colors[0] = BLACK
+        for i in range(1, layer + 1):
+            ids = np.arange(
+                layer_offsets[i-1], layer_offsets[i], dtype=np.int64)
+            (spec_ids, layer_parents, layer_colors) = table.next_layer(
+                spec_ids, ids)
+            (start, stop) = (layer_offsets[i], layer_offsets[i+1])
+            parents[start:stop] = layer_parents
+            label_ids[start:stop] = table.label_ids[spec_ids]
+            colors[start:stop] = layer_colors
+
+        # Find the size of each partition's descendants at each depth below
+        # the partition layer.
+        depths = len(sizes) - layer
+        weights = sum(sizes_below[k][spec_ids] for k in range(depths))
+        ranges = _partition(weights, partitions)
+        range_starts = [start for (start, _) in ranges]
+        part_sizes = np.stack([
+            np.add.reduceat(sizes_below[k][spec_ids], range_starts)
+            for k in range(depths)
+        ], axis=1)
+
+        # Each layer visits the last in reverse, so the order of the
+        # partitions' blocks alternates between layers.
+        block_starts = np.empty_like(part_sizes)
+        for k in range(depths):
+            layer_sizes = part_sizes[:, k]
+            if k % 2 == 1:
+                layer_sizes = layer_sizes[::-1]
+            starts = (
+                layer_offsets[layer + k] + np.cumsum(layer_sizes) - layer_sizes)
+            if k % 2 == 1:
+                starts = starts[::-1]
+            block_starts[:, k] = starts
+
+        for array in (parents, label_ids, colors):
+            if isinstance(array, np.memmap):
+                array.flush()
+        del parents, label_ids, colors
+
+        jobs = [
+            (table, spec_ids[start:stop], block_starts[p].tolist(), out_path)
+            for (p, (start, stop)) in enumerate(ranges)
+        ]
+        if depths > 1:
+            with ProcessPoolExecutor(max_workers) as executor:
+                for _ in executor.map(_expand_partition, jobs):
+                    pass
+
+        if path is None:
+            tree = store._open(out_path, "r+")
+        else:
+            tree = store.open_store(out_path)
+    finally:
+        # The temporary store stays mapped until its arrays are freed
+        if path is None:
+            os.unlink(out_path)
+
+    return tree
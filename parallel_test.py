@@ -0,0 +1,66 @@
+from parallel import *
+from treespec import parse
+import expansion
+import parallel
+import store
+from expansion_test import assert_same
+import numpy as np
+import pytest
+
+SPECS = [
+    "a",
+    "A {3IC}-> B -> C {2XC}-> D -> E",
+    "A -> B {2IC}-> C -> D {2XD}-> (E {3IC}-> F {2XC}-> G, E -> G)",
+    "a {3XD}-> (b {2XC}-> c {2XD}-> (d, e -> d), d, e {3IC}-> f {2XD}-> (d, b -> d))",
+]
+
+def test_expand_matches_sequential():
+    for spec_str in SPECS:
+        spec = parse(spec_str)
+        sequential = expansion.expand(spec)
+        for layer in range(sequential.num_layers()):
+            for partitions in (1, 2, 3, 5):
+                assert_same(
+                    expand(spec, partitions, layer, max_workers=2),
+                    sequential
+                )
+
+def test_expand_default_layer():
+    spec = parse("a {3XC}-> b {4IC}-> c {5XC}-> d {2IC}-> e")
+    assert_same(expand(spec, max_workers=2), expansion.expand(spec))
+
+def test_expand_to_store(tmp_path):
+    spec = parse(SPECS[-1])
+    path = str(tmp_path / "tree.tsx")
+    tree = expand(spec, 3, 2, max_workers=2, path=path)
+    assert_same(tree, expansion.expand(spec))
+    assert_same(store.open_store(path), expansion.expand(spec))
+
+def test_expand_temporary_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(parallel, "TEMP_DIR", str(tmp_path))
+    spec = parse(SPECS[-1])
+    tree = expand(spec, 3, 2, max_workers=2)
+    assert list(tmp_path.iterdir()) == []
+    assert_same(tree, expansion.expand(spec))
+
+    # Still mapped (and writable) after the file is gone
+    parents = tree.parents[1:]
+    del tree
+    parents[:] = 0
+    assert parents.sum() == 0
+
+def test_expand_empty():
+    assert len(expand(parse(""))) == 0
+
+def test_f_expand_layer():
+    with pytest.raises(ValueError):
+        expand(parse("a -> b"), layer=2)
+
+def test_partition():
+    assert partition_sizes([1, 1, 1, 1], 2) == [2, 2]
+    assert partition_sizes([5, 1, 1, 1], 2) == [1, 3]
+    assert partition_sizes([1, 1], 4) == [1, 1]
+
+def partition_sizes(weights, partitions):
+    return [stop - start for (start, stop) in
+        parallel._partition(np.array(weights), partitions)]
@@ -0,0 +1,125 @@
+"""
+Compiles spec trees into expansion plans, for expanding the same spec tree
+many times.
+
+A plan stores, for each layer of the expanded tree, the index of each node's
+parent within the previous layer (its parent-index template), and a table of
+the label id and edge colour of every node, each in the smallest integer type
+that fits. Running a plan is a few whole-array operations per layer, and can
+fill caller-provided arrays, so no per-node Python objects are created.
+"""
+
+from typing import Optional
+import numpy as np
+
+from treespec import Node
+from expansion import Expansion, _SpecTable, expand_layers
+
+# Object Model
+# --------------------------------------------------
+
+def _smallest_uint(max_value):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+class Plan:
+    """
+    A compiled, reusable expansion of a spec tree.
+
+    - layer_offsets: As in `Expansion`.
+    - parent_templates: The index of each node's parent within the previous
+      layer (0 for the root).
+    - label_ids, colors: As in `Expansion`.
+    - labels: As in `Expansion`.
+    """
+
+    def __init__(
+        self, layer_offsets, parent_templates, label_ids, colors, labels
+    ):
+        self.layer_offsets = layer_offsets
+        self.parent_templates = parent_templates
+        self.label_ids = label_ids
+        self.colors = colors
+        self.labels = labels
+
+    def __len__(self):
+        return int(self.layer_offsets[-1])
+
+    def num_layers(self):
+        return len(self.layer_offsets) - 1
+
+    def _buffer(self, name, buffer, dtype):
+        if buffer is None:
+            return np.empty(len(self), dtype=dtype)
+        if len(buffer) < len(self):
+            raise ValueError(
+                f"{name} buffer has {len(buffer)} elements, but the plan"
+                f" expands to {len(self)} nodes"
+            )
+        return buffer[:len(self)]
+
+    def run(
+        self,
+        parents: Optional[np.ndarray] = None,
+        label_ids: Optional[np.ndarray] = None,
+        colors: Optional[np.ndarray] = None
+    ) -> Expansion:
+        """
+        Expand the plan into an `Expansion`.
+
+        If given, the expansion's arrays are written into (the start of) the
+        given buffers, rather than into new arrays.
+        """
+
+        parents = self._buffer("parents", parents, np.int64)
+        label_ids = self._buffer("label_ids", label_ids, np.int32)
+        colors = self._buffer("colors", colors, np.uint8)
+
+        if len(self) > 0:
+            parents[0] = -1
+        for i in range(1, self.num_layers()):
+            (start, stop) = (self.layer_offsets[i], self.layer_offsets[i+1])
+            np.add(
+                self.parent_templates[start:stop],
+                self.layer_offsets[i-1],
+                out=parents[start:stop],
+                dtype=parents.dtype
+            )
+        np.copyto(label_ids, self.label_ids, casting="same_kind")
+        np.copyto(colors, self.colors, casting="same_kind")
+
+        return Expansion(
+            parents, label_ids, colors, self.layer_offsets, self.labels)
+
+# Compiler
+# --------------------------------------------------
+
+def compile(spec: Optional[Node]) -> Plan:
+    """Compile the given spec tree into an expansion plan."""
+
+    if spec is None:
+        empty = np.empty(0, dtype=np.uint8)
+        return Plan(np.zeros(1, dtype=np.int64), empty, empty, empty, [])
+
+    table = _SpecTable(spec)
+    sizes = [int(size[0]) for size in table.subtree_sizes()]
+    layer_offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    num_nodes = int(layer_offsets[-1])
+
+    parent_templates = np.empty(num_nodes, dtype=_smallest_uint(max(sizes)))
+    label_ids = np.empty(num_nodes, dtype=_smallest_uint(len(table.labels)))
+    colors = np.empty(num_nodes, dtype=np.uint8)
+    for (i, (spec_ids, parents, layer_colors)) in enumerate(
+        expand_layers(table)
+    ):
+        (start, stop) = (layer_offsets[i], layer_offsets[i+1])
+        if i == 0:
+            parent_templates[start:stop] = 0
+        else:
+            parent_templates[start:stop] = parents - layer_offsets[i-1]
+        label_ids[start:stop] = table.label_ids[spec_ids]
+        colors[start:stop] = layer_colors
+
+    return Plan(layer_offsets, parent_templates, label_ids, colors, table.labels)
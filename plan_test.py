@@ -0,0 +1,42 @@
+from plan import *
+from treespec import parse
+from expansion import expand
+from expansion_test import SPEC, assert_same
+import numpy as np
+import pytest
+
+def test_run():
+    spec = parse(SPEC)
+    plan = compile(spec)
+    assert len(plan) == len(expand(spec))
+    assert_same(plan.run(), expand(spec))
+    assert_same(plan.run(), expand(spec))
+
+def test_run_into_buffers():
+    spec = parse(SPEC)
+    plan = compile(spec)
+    parents = np.zeros(len(plan) + 5, dtype=np.int64)
+    label_ids = np.zeros(len(plan), dtype=np.int32)
+    colors = np.zeros(len(plan), dtype=np.uint8)
+
+    for _ in range(3):
+        expansion = plan.run(parents, label_ids, colors)
+        assert_same(expansion, expand(spec))
+        assert np.shares_memory(expansion.parents, parents)
+        assert np.shares_memory(expansion.label_ids, label_ids)
+    assert (parents[len(plan):] == 0).all()
+
+def test_f_run_small_buffer():
+    plan = compile(parse(SPEC))
+    with pytest.raises(ValueError):
+        plan.run(np.zeros(len(plan) - 1, dtype=np.int64))
+
+def test_compact_templates():
+    plan = compile(parse("a {9XC}-> b {9XC}-> c"))
+    assert plan.parent_templates.dtype == np.uint8
+    assert plan.label_ids.dtype == np.uint8
+
+def test_empty():
+    plan = compile(parse(""))
+    assert len(plan) == 0
+    assert len(plan.run()) == 0
@@ -0,0 +1,336 @@
+"""
+Answers label, depth and ancestor queries about the tree that a spec tree
+expands into, without expanding it.
+
+Counts are computed from the multiplicities of the relations in the spec tree,
+and the ids (as numbered by `treespec.graph()`) of matching nodes are found by
+descending only into the parts of the tree that contain matches.
+
+Within the expanded tree, the descendants of any node at a given depth below it
+are consecutive, and `graph()` visits each layer in reverse, so the order of a
+node's child subtrees alternates between layers: at odd relative depths, its
+descendants are ordered by child subtree, and at even depths, in reverse.
+"""
+
+import sys
+from typing import Iterator, Optional
+
+import utils
+from treespec import Node, parse, layer_sizes
+
+# Helpers
+# --------------------------------------------------
+
+def _children(node: Node) -> list:
+    """Return the child node specs of a node spec, as `graph()` expands them."""
+
+    rel = node.get_relation()
+    if rel is None:
+        return []
+
+    next_nodes = rel.get_next()
+    if utils.is_iterable(next_nodes):
+        return list(next_nodes)
+    return [next_nodes] * rel.get_num()
+
+def _count_below(memo, state, depth, key, children, leaf):
+    """
+    Return the sum of `leaf(s)` over the states `s` that are `depth` layers
+    below the given state, where `children(s)` returns the states one layer
+    below `s`, and `key(s)` identifies `s`.
+
+    Counts are computed bottom-up, one layer at a time, and the count below
+    every state passed through is memoised (as `memo[(key(s), depth)]`).
+    """
+
+    # Find the unique states in each layer, down to the given depth, without
+    # descending below those already counted.
+    child_keys = {}
+    layers = [{key(state): state}]
+    for d in range(depth):
+        next_layer = {}
+        for (k, s) in layers[-1].items():
+            if (k, depth - d) in memo:
+                continue
+            if k not in child_keys:
+                child_keys[k] = [(key(child), child) for child in children(s)]
+            next_layer.update(child_keys[k])
+        layers.append(next_layer)
+
+    for d in range(depth, -1, -1):
+        for (k, s) in layers[d].items():
+            if (k, depth - d) in memo:
+                continue
+            if d == depth:
+                count = leaf(s)
+            else:
+                count = sum(
+                    memo[(child_key, depth - d - 1)]
+                    for (child_key, _) in child_keys[k]
+                )
+            memo[(k, depth - d)] = count
+    return memo[(key(state), depth)]
+
+class _Query:
+    """
+    The number of nodes with a given label, optionally under an ancestor with
+    a given label, at each depth below each node spec.
+    """
+
+    def __init__(self, index, label, under):
+        self.index = index
+        self.label = label
+        self.under = under
+        self.memo = {}
+
+    def _state_key(self, state):
+        (node, seen) = state
+        return (id(node), seen)
+
+    def _child_states(self, state):
+        (node, seen) = state
+        seen_below = seen or node.get_name() == self.under
+        return [(child, seen_below) for child in self.index.children(node)]
+
+    def _leaf_count(self, state):
+        (node, seen) = state
+        return int(
+            node.get_name() == self.label
+            and (self.under is None or seen)
+        )
+
+    def matches(self, node, depth, seen=False):
+        """
+        Return the number of matching nodes `depth` layers below the given
+        node spec, where `seen` is whether an ancestor matched `under`.
+        """
+
+        key = ((id(node), seen), depth)
+        if key not in self.memo:
+            _count_below(
+                self.memo, (node, seen), depth,
+                self._state_key, self._child_states, self._leaf_count
+            )
+        return self.memo[key]
+
+    def positions(self, node, depth, offset, seen=False):
+        """
+        Yield the position of each matching node `depth` layers below the
+        given node spec, within that layer, where `offset` is the position
+        of the first node in that layer below the given node spec.
+        """
+
+        stack = [(node, depth, offset, seen)]
+        while len(stack) > 0:
+            (node, depth, offset, seen) = stack.pop()
+            if self.matches(node, depth, seen) == 0:
+                continue
+            if depth == 0:
+                yield offset
+                continue
+
+            seen_below = seen or node.get_name() == self.under
+            children = self.index.children(node)
+            if depth % 2 == 0:
+                children = children[::-1]
+
+            # Visit the children in order, so push them in reverse
+            child_items = []
+            for child in children:
+                child_items.append((child, depth - 1, offset, seen_below))
+                offset += self.index.size(child, depth - 1)
+            stack.extend(reversed(child_items))
+
+# Index
+# --------------------------------------------------
+
+class Index:
+    """
+    An index of a spec tree, for querying the tree it expands into.
+
+    On creation, this records which node specs have each label, at which depths
+    of the expanded tree, and how many nodes each one represents there.
+    """
+
+    def __init__(self, spec: Optional[Node]):
+        self.spec = spec
+        self.sizes = layer_sizes(spec)
+        self.layer_offsets = [0]
+        for size in self.sizes:
+            self.layer_offsets.append(self.layer_offsets[-1] + size)
+
+        self.child_memo = {}
+        self.size_memo = {}
+
+        # Label -> [(depth, node spec, count)]
+        self.by_label = {}
+        layer = {id(spec): (spec, 1)} if spec is not None else {}
+        depth = 0
+        while len(layer) > 0:
+            next_layer = {}
+            for (node, count) in layer.values():
+                self.by_label.setdefault(node.get_name(), []).append(
+                    (depth, node, count))
+                for child in self.children(node):
+                    (_, child_count) = next_layer.get(id(child), (None, 0))
+                    next_layer[id(child)] = (child, child_count + count)
+            layer = next_layer
+            depth += 1
+
+    def children(self, node: Node) -> list:
+        key = id(node)
+        if key not in self.child_memo:
+            self.child_memo[key] = _children(node)
+        return self.child_memo[key]
+
+    def size(self, node: Node, depth: int) -> int:
+        """Return the number of nodes `depth` layers below a node spec."""
+
+        key = (id(node), depth)
+        if key not in self.size_memo:
+            _count_below(
+                self.size_memo, node, depth,
+                id, self.children, lambda _: 1
+            )
+        return self.size_memo[key]
+
+    def labels(self) -> list:
+        return list(self.by_label)
+
+    def positions(self, label: str) -> list:
+        """
+        Return the `(depth, node spec, count)` of each node spec with the given
+        label, where `count` is the number of nodes it represents at `depth`.
+        """
+        return list(self.by_label.get(label, []))
+
+    def depths(self, label: str, under: Optional[str] = None) -> dict:
+        """
+        Return the number of nodes with the given label at each depth (where
+        there are any), optionally only counting those with an ancestor
+        labelled `under`.
+        """
+
+        if self.spec is None:
+            return {}
+        if under is None:
+            counts = {}
+            for (depth, _, count) in self.by_label.get(label, []):
+                counts[depth] = counts.get(depth, 0) + count
+            return dict(sorted(counts.items()))
+
+        # Count the copies of each (node spec, seen `under`) pair in each layer,
+        # down to the deepest layer with the label.
+        label_depths = {d for (d, _, _) in self.by_label.get(label, [])}
+        max_depth = max(label_depths, default=-1)
+
+        counts = {}
+        layer = {(id(self.spec), False): (self.spec, False, 1)}
+        for depth in range(max_depth + 1):
+            next_layer = {}
+            for (node, seen, count) in layer.values():
+                if node.get_name() == label and seen:
+                    counts[depth] = counts.get(depth, 0) + count
+
+                seen_below = seen or node.get_name() == under
+                for child in self.children(node):
+                    key = (id(child), seen_below)
+                    (_, _, child_count) = next_layer.get(key, (None, None, 0))
+                    next_layer[key] = (child, seen_below, child_count + count)
+            layer = next_layer
+        return counts
+
+    def count(
+        self,
+        label: Optional[str] = None,
+        depth: Optional[int] = None,
+        under: Optional[str] = None
+    ) -> int:
+        """
+        Return the number of nodes with the given label (or any label), at the
+        given depth (or any depth), optionally only counting those with an
+        ancestor labelled `under`.
+        """
+
+        if label is None:
+            if under is not None:
+                return sum(self.count(l, depth, under) for l in self.labels())
+            if depth is None:
+                return sum(self.sizes)
+            return self.sizes[depth] if 0 <= depth < len(self.sizes) else 0
+
+        depths = self.depths(label, under)
+        if depth is None:
+            return sum(depths.values())
+        return depths.get(depth, 0)
+
+    def ancestors(self, label: str) -> dict:
+        """
+        Return, for each label, how many nodes with the given label have an
+        ancestor with that label.
+        """
+
+        counts = {}
+        layer = {}
+        if self.spec is not None:
+            layer[(id(self.spec), frozenset())] = (self.spec, frozenset(), 1)
+
+        while len(layer) > 0:
+            next_layer = {}
+            for (node, above, count) in layer.values():
+                if node.get_name() == label:
+                    for ancestor in above:
+                        counts[ancestor] = counts.get(ancestor, 0) + count
+
+                above_child = above | {node.get_name()}
+                for child in self.children(node):
+                    key = (id(child), above_child)
+                    (_, _, child_count) = next_layer.get(key, (None, None, 0))
+                    next_layer[key] = (child, above_child, child_count + count)
+            layer = next_layer
+
+        return dict(sorted(counts.items()))
+
+    def find(
+        self,
+        label: str,
+        depth: Optional[int] = None,
+        under: Optional[str] = None
+    ) -> Iterator[int]:
+        """
+        Lazily yield the ids (as numbered by `graph()`) of the nodes with the
+        given label, at the given depth (or any depth), optionally only those
+        with an ancestor labelled `under`, in ascending order.
+        """
+
+        if self.spec is None:
+            return
+
+        if depth is None:
+            depths = sorted({d for (d, _, _) in self.by_label.get(label, [])})
+        else:
+            depths = [depth] if 0 <= depth < len(self.sizes) else []
+
+        query = _Query(self, label, under)
+        for d in depths:
+            for position in query.positions(self.spec, d, 0):
+                yield self.layer_offsets[d] + position
+
+# Direct Usage
+# --------------------------------------------------
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(
+            "You must provide a spec and label argument.",
+            "Syntax: python query.py <spec_str> <label> [<under_label>]",
+            sep="\n"
+        )
+        sys.exit(1)
+    index = Index(parse(sys.argv[1]))
+    label = sys.argv[2]
+    under = sys.argv[3] if len(sys.argv) >= 4 else None
+
+    for (depth, count) in index.depths(label, under).items():
+        print(f"depth {depth}: {count}")
+    print(f"total: {index.count(label, under=under)}")
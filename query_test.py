@@ -0,0 +1,90 @@
+from query import *
+from treespec import parse
+from expansion import expand
+import numpy as np
+
+SPECS = [
+    "A {3IC}-> B -> C {2XC}-> D -> E",
+    "A -> B {2IC}-> C -> D {2XD}-> (E {3IC}-> F {2XC}-> G, E -> G)",
+    "a {3XD}-> (b {2XC}-> c {2XD}-> (d, e -> d), d, e {3IC}-> f {2XD}-> (d, b -> d))",
+    "$s = b {2XD}-> (c, d {2XC}-> c); a {3XD}-> ($s, x -> $s, y {2IC}-> $s)",
+]
+
+def expanded_matches(expansion, label, depth=None, under=None):
+    """Find matching nodes by brute force over the expanded tree."""
+
+    ids = []
+    for node_id in range(len(expansion)):
+        if expansion.get_label(node_id) != label:
+            continue
+        if depth is not None and expansion.layer_of(node_id) != depth:
+            continue
+        if under is not None:
+            ancestor = expansion.parents[node_id]
+            while ancestor >= 0 and expansion.get_label(ancestor) != under:
+                ancestor = expansion.parents[ancestor]
+            if ancestor < 0:
+                continue
+        ids.append(node_id)
+    return ids
+
+def test_find_matches_expansion():
+    for spec_str in SPECS:
+        spec = parse(spec_str)
+        index = Index(spec)
+        expansion = expand(spec)
+        for label in index.labels():
+            for under in [None] + index.labels():
+                expected = expanded_matches(expansion, label, under=under)
+                assert list(index.find(label, under=under)) == expected
+                assert index.count(label, under=under) == len(expected)
+
+                for depth in range(expansion.num_layers()):
+                    expected = expanded_matches(expansion, label, depth, under)
+                    assert list(index.find(label, depth, under)) == expected
+                    assert index.count(label, depth, under) == len(expected)
+
+def test_find_lazy():
+    index = Index(parse("a {9XC}-> b {9XC}-> c {9XC}-> d {9XC}-> e {9XC}-> f"))
+    found = index.find("f")
+    assert next(found) == 1 + 9 + 81 + 729 + 6561
+    assert index.count("f") == 9 ** 5
+
+def test_count():
+    index = Index(parse("A {3IC}-> B -> C {2XC}-> D -> E"))
+    assert index.count() == 1 + 3 + 3 + 6 + 6
+    assert index.count(depth=3) == 6
+    assert index.count("D") == 6
+    assert index.count("D", 2) == 0
+    assert index.count("X") == 0
+
+def test_depths():
+    index = Index(parse("a {2XD}-> (b, c -> b {3XC}-> b)"))
+    assert index.depths("b") == {1: 1, 2: 1, 3: 3}
+    assert index.depths("b", under="c") == {2: 1, 3: 3}
+    assert index.depths("b", under="b") == {3: 3}
+
+def test_positions():
+    spec = parse("$s = b; a {2XD}-> ($s, c {3IC}-> $s)")
+    positions = Index(spec).positions("b")
+    assert [(depth, count) for (depth, _, count) in positions] == [(1, 1), (2, 3)]
+    assert positions[0][1] is positions[1][1]
+
+def test_ancestors():
+    index = Index(parse("a {2XD}-> (b {2XC}-> d, c -> b -> d)"))
+    assert index.ancestors("d") == {"a": 3, "b": 3, "c": 1}
+    assert index.ancestors("a") == {}
+
+def test_empty():
+    index = Index(parse(""))
+    assert index.count() == 0
+    assert index.count("a") == 0
+    assert list(index.find("a")) == []
+    assert index.ancestors("a") == {}
+
+def test_deep():
+    index = Index(parse("a" + " -> b" * 3000 + " {2XC}-> c"))
+    assert list(index.find("b", 2999)) == [2999]
+    assert list(index.find("c", under="b")) == [3001, 3002]
+    assert index.count("b", under="a") == 3000
+    assert index.size(index.spec, 3001) == 2
@@ -0,0 +1,263 @@
+"""
+Renders very large trees as many small files (shards), rather than one huge one.
+
+The expanded tree is cut every `depth` layers, and each node on a cut is the
+root of a shard that contains its descendants down to the next cut. Each shard
+is rendered to its own SVG file, with dashed stub nodes linking to its parent
+shard (below its root) and to its child shards (above its top layer). A JSON
+manifest maps each shard to its position in the overall tree.
+"""
+
+import os
+import sys
+import json
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import graphviz as gv
+import numpy as np
+
+from treespec import Node, parse
+from expansion import Expansion, COLORS, BLACK, expand
+import layout
+
+BATCH_SIZE = 1024
+
+# Object Model
+# --------------------------------------------------
+
+class Shard:
+    """
+    A subtree of an expanded tree, from a cut to (but not including) the next.
+
+    - root: The id of the shard's root node.
+    - layer: The layer of the shard's root node.
+    - ranges: The range of ids of the shard's nodes in each of its layers.
+    - parent: The root id of the parent shard (None for the root shard).
+    - children: The root ids of the child shards.
+    """
+
+    def __init__(self, root, layer, ranges, parent, children):
+        self.root = root
+        self.layer = layer
+        self.ranges = ranges
+        self.parent = parent
+        self.children = children
+
+    def __len__(self):
+        return sum(len(r) for r in self.ranges)
+
+def shards(expansion: Expansion, depth: int) -> list:
+    """
+    Split the given expanded tree into shards of (at most) `depth` layers each.
+    """
+
+    if depth < 1:
+        raise ValueError(f"shard depth must be at least 1, not: {depth}")
+    if len(expansion) == 0:
+        return []
+
+    all_shards = []
+
+    # The root of the parent shard of each node in the current cut layer
+    cut_parents = np.full(1, -1, dtype=np.int64)
+    for layer in range(0, expansion.num_layers(), depth):
+        # Find the range of descendants of every node in the cut layer, in
+        # each layer of their shards and the layer below them, all at once.
+        cut = expansion.layer(layer)
+        starts = np.arange(cut.start, cut.stop, dtype=np.int64)
+        stops = starts + 1
+        layer_starts = [starts.tolist()]
+        layer_stops = [stops.tolist()]
+        for i in range(layer, min(layer + depth, expansion.num_layers())):
+            bounds = expansion.child_bounds(i)
+            offset = expansion.layer_offsets[i]
+            (starts, stops) = (bounds[stops - offset], bounds[starts - offset])
+            layer_starts.append(starts.tolist())
+            layer_stops.append(stops.tolist())
+
+        for (r, (root, parent)) in enumerate(
+            zip(range(cut.start, cut.stop), cut_parents.tolist())
+        ):
+            ranges = [range(root, root + 1)]
+            for k in range(1, min(depth, len(layer_starts))):
+                if layer_starts[k][r] == layer_stops[k][r]:
+                    break
+                ranges.append(range(layer_starts[k][r], layer_stops[k][r]))
+            if len(ranges) == depth:
+                children = list(range(
+                    layer_starts[depth][r], layer_stops[depth][r]))
+            else:
+                children = []
+
+            all_shards.append(Shard(
+                root,
+                layer,
+                ranges,
+                None if parent < 0 else parent,
+                children
+            ))
+
+        # Find the shard root above each node in the next cut layer
+        if layer + depth >= expansion.num_layers():
+            break
+        next_cut = expansion.layer(layer + depth)
+        cut_parents = np.arange(next_cut.start, next_cut.stop, dtype=np.int64)
+        for _ in range(depth):
+            cut_parents = expansion.parents[cut_parents]
+
+    return all_shards
+
+# Renderer
+# --------------------------------------------------
+
+def shard_name(prefix: str, root: int) -> str:
+    return f"{prefix}-{root}"
+
+def _shard_expansion(expansion: Expansion, shard: Shard, prefix: str) -> tuple:
+    """
+    Return the given shard as an expansion of its own, including its stubs,
+    and the links of its stub nodes.
+    """
+
+    (subtree, _) = expansion.subtree(shard.root, len(shard.ranges) + 1)
+    links = {}
+
+    # Child stubs are the extra layer above the shard
+    if len(shard.children) > 0:
+        stubs = subtree.layer(subtree.num_layers() - 1)
+        for (node_id, child) in zip(stubs, shard.children):
+            links[node_id] = shard_name(prefix, child) + ".svg"
+
+    # The parent stub becomes the new root, below the shard's root
+    if shard.parent is not None:
+        parent_id = expansion.parents[shard.root]
+        subtree = Expansion(
+            np.concatenate([[-1, 0], subtree.parents[1:] + 1]),
+            np.concatenate([
+                [expansion.label_ids[parent_id]], subtree.label_ids]),
+            np.concatenate([[BLACK], subtree.colors]),
+            np.concatenate([[0], subtree.layer_offsets + 1]),
+            subtree.labels
+        )
+        links = {node_id + 1: link for (node_id, link) in links.items()}
+        links[0] = shard_name(prefix, shard.parent) + ".svg"
+
+    return (subtree, links)
+
+def _digraph(expansion: Expansion, links: dict, engine: str) -> gv.Digraph:
+    """Make a graphviz graph of the given expanded tree, as `graph()` would."""
+
+    graph = gv.Digraph(graph_attr={"rankdir": "BT"}, engine=engine)
+    for node_id in range(len(expansion)):
+        attrs = {"label": expansion.get_label(node_id)}
+        if node_id in links:
+            attrs.update(style="dashed", URL=links[node_id])
+        graph.node(str(node_id), **attrs)
+
+        parent = expansion.parents[node_id]
+        if parent >= 0:
+            graph.edge(
+                str(parent), str(node_id),
+                color=COLORS[expansion.colors[node_id]]
+            )
+    return graph
+
+def _render_shard(args):
+    (expansion, links, path, engine) = args
+    if engine == "native":
+        with open(path + ".svg", "w") as f:
+            f.write(layout.svg_expansion(expansion, links))
+    else:
+        # Only write the SVG (not the DOT source, which would replace any
+        # file at the path without the extension).
+        svg = _digraph(expansion, links, engine).pipe(format="svg")
+        with open(path + ".svg", "wb") as f:
+            f.write(svg)
+
+def render(
+    spec: Optional[Node],
+    depth: int,
+    out_dir: str = ".",
+    prefix: str = "shard",
+    engine: str = "native",
+    max_workers: Optional[int] = None
+) -> str:
+    """
+    Render the given spec tree as shards of `depth` layers, in parallel.
+
+    Each shard is written to `<out_dir>/<prefix>-<root id>.svg`, where the root
+    id is the id (as in `graph()`) of the shard's root node. The manifest is
+    written to `<out_dir>/<prefix>.json`, and its path is returned.
+    """
+
+    expansion = expand(spec)
+    all_shards = shards(expansion, depth)
+    os.makedirs(out_dir, exist_ok=True)
+
+    def jobs():
+        for shard in all_shards:
+            (shard_expansion, links) = _shard_expansion(expansion, shard, prefix)
+            path = os.path.join(out_dir, shard_name(prefix, shard.root))
+            yield (shard_expansion, links, path, engine)
+
+    # Submit in batches, so only a batch of shards is held in memory at once
+    with ProcessPoolExecutor(max_workers) as executor:
+        jobs_iter = jobs()
+        while True:
+            batch = list(itertools.islice(jobs_iter, BATCH_SIZE))
+            if len(batch) == 0:
+                break
+            for _ in executor.map(_render_shard, batch, chunksize=16):
+                pass
+
+    manifest = {
+        "depth": depth,
+        "num_nodes": len(expansion),
+        "num_layers": expansion.num_layers(),
+        "root": shard_name(prefix, 0) if len(all_shards) > 0 else None,
+        "shards": {
+            shard_name(prefix, shard.root): {
+                "file": shard_name(prefix, shard.root) + ".svg",
+                "root": shard.root,
+                "layer": shard.layer,
+                "ranges": [[r.start, r.stop] for r in shard.ranges],
+                "parent": (
+                    None if shard.parent is None
+                    else shard_name(prefix, shard.parent)),
+                "children": [
+                    shard_name(prefix, child) for child in shard.children],
+            }
+            for shard in all_shards
+        }
+    }
+    manifest_path = os.path.join(out_dir, prefix + ".json")
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest_path
+
+# Direct Usage
+# --------------------------------------------------
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(
+            "You must provide a spec and shard depth argument.",
+            "Syntax: python shard.py <spec_str> <depth> [<engine>] [<out_dir>]",
+            sep="\n"
+        )
+        sys.exit(1)
+    spec_str = sys.argv[1]
+    depth = int(sys.argv[2])
+
+    if len(sys.argv) >= 4:
+        engine = sys.argv[3]
+    else:
+        engine = "native"
+
+    if len(sys.argv) >= 5:
+        out_dir = sys.argv[4]
+    else:
+        out_dir = "shards"
+
+    render(parse(spec_str), depth, out_dir, engine=engine)
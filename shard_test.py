@@ -0,0 +1,70 @@
+from shard import *
+from shard import _render_shard
+import pytest
+from treespec import parse
+import json
+import xml.etree.ElementTree as ET
+
+def test_shards_cover_tree():
+    expansion = expand(parse("a {2XC}-> b {3IC}-> c -> d {2XD}-> (e, f -> g)"))
+    all_shards = shards(expansion, 2)
+
+    ids = sorted(
+        node_id for shard in all_shards
+        for r in shard.ranges for node_id in r)
+    assert ids == list(range(len(expansion)))
+
+def test_shards_links():
+    expansion = expand(parse("a {2XC}-> b {3IC}-> c -> d {2XC}-> e"))
+    all_shards = shards(expansion, 2)
+    by_root = {shard.root: shard for shard in all_shards}
+
+    assert by_root[0].parent is None
+    assert len(by_root[0].children) == 6
+    for shard in all_shards:
+        for child in shard.children:
+            assert by_root[child].parent == shard.root
+            assert expansion.layer_of(child) == shard.layer + 2
+
+def test_f_shards_depth():
+    with pytest.raises(ValueError):
+        shards(expand(parse("a")), 0)
+
+def test_shards_empty():
+    assert shards(expand(parse("")), 2) == []
+
+def test_render(tmp_path):
+    manifest_path = render(
+        parse("a {2XC}-> b {3IC}-> c -> d"), 2, str(tmp_path), max_workers=2)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    assert manifest["num_nodes"] == 1 + 2 + 6 + 6
+    assert len(manifest["shards"]) == 1 + 6
+    root = manifest["shards"][manifest["root"]]
+    assert root["ranges"] == [[0, 1], [1, 3]]
+
+    ns = {"svg": "http://www.w3.org/2000/svg"}
+    for (name, shard) in manifest["shards"].items():
+        svg_root = ET.parse(tmp_path / shard["file"]).getroot()
+        hrefs = {a.get("href") for a in svg_root.findall(".//svg:a", ns)}
+        expected = {
+            manifest["shards"][child]["file"] for child in shard["children"]}
+        if shard["parent"] is not None:
+            expected.add(manifest["shards"][shard["parent"]]["file"])
+        assert hrefs == expected
+        for link in hrefs:
+            assert (tmp_path / link).exists()
+
+def test_render_shard_graphviz_keeps_other_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        gv.Digraph, "pipe", lambda self, format: b"<svg/>")
+    expansion = expand(parse("a {2XC}-> b"))
+    path = str(tmp_path / "shard-0")
+    (tmp_path / "shard-0").write_text("keep me")
+
+    _render_shard((expansion, {}, path, "dot"))
+    assert (tmp_path / "shard-0").read_text() == "keep me"
+    assert (tmp_path / "shard-0.svg").read_bytes() == b"<svg/>"
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "shard-0", "shard-0.svg"]
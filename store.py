@@ -0,0 +1,188 @@
+"""
+Stores expanded trees on disk, in a file format that can be memory-mapped.
+
+A store is written once, then can be opened any number of times (by any number
+of processes) without reading it into memory: its arrays are memory-mapped, so
+they're shared through the page cache, and only the parts of them that are used
+are read from disk.
+
+File format (all integers are little-endian):
+- Header (see `HEADER`): magic number, format version, number of nodes, number
+  of layers, then the byte offset and size of each section.
+- Sections, each aligned to `ALIGNMENT` bytes:
+  - labels: The unique labels, as a UTF-8 JSON list.
+  - layer_offsets: int64 * (number of layers + 1), as in `Expansion`.
+  - parents: int64 * number of nodes.
+  - label_ids: int32 * number of nodes.
+  - colors: uint8 * number of nodes.
+"""
+
+import sys
+import json
+import struct
+from typing import Optional
+import numpy as np
+
+from treespec import Node, parse
+from expansion import Expansion, _SpecTable, expand_layers
+
+MAGIC = b"TSLTREE\0"
+VERSION = 1
+ALIGNMENT = 64
+
+# magic, version, num_nodes, num_layers, then (offset, size) of each section
+HEADER = struct.Struct("<8sIxxxxQQ" + "QQ" * 5)
+
+# (name, dtype) of each array section, after the labels section
+_SECTIONS = (
+    ("layer_offsets", np.dtype("<i8")),
+    ("parents", np.dtype("<i8")),
+    ("label_ids", np.dtype("<i4")),
+    ("colors", np.dtype("u1")),
+)
+
+# Layout
+# --------------------------------------------------
+
+def _align(pos):
+    return -(-pos // ALIGNMENT) * ALIGNMENT
+
+def _layout(num_nodes, num_layers, labels_size):
+    """Return the (offset, size) of each section, starting with the labels."""
+
+    lengths = (num_layers + 1, num_nodes, num_nodes, num_nodes)
+    sections = [(_align(HEADER.size), labels_size)]
+    for ((_, dtype), length) in zip(_SECTIONS, lengths):
+        (prev_offset, prev_size) = sections[-1]
+        sections.append(
+            (_align(prev_offset + prev_size), length * dtype.itemsize))
+    return sections
+
+def _map(path, mode, sections, lengths):
+    """Memory-map each array section of a store."""
+
+    arrays = []
+    for ((_, dtype), (offset, _), length) in zip(
+        _SECTIONS, sections[1:], lengths
+    ):
+        if length == 0:
+            arrays.append(np.empty(0, dtype=dtype))
+        else:
+            arrays.append(np.memmap(
+                path, dtype=dtype, mode=mode, offset=offset, shape=(length,)))
+    return arrays
+
+def _create(path, num_nodes, layer_offsets, labels):
+    """
+    Create a store of the given size, and return its writable node arrays.
+    """
+
+    num_layers = len(layer_offsets) - 1
+    labels_bytes = json.dumps(labels).encode()
+    sections = _layout(num_nodes, num_layers, len(labels_bytes))
+    (end_offset, end_size) = sections[-1]
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(
+            MAGIC, VERSION, num_nodes, num_layers,
+            *(value for section in sections for value in section)
+        ))
+        f.seek(sections[0][0])
+        f.write(labels_bytes)
+        f.truncate(end_offset + end_size)
+
+    (offsets, parents, label_ids, colors) = _map(
+        path, "r+", sections, (num_layers + 1, num_nodes, num_nodes, num_nodes))
+    offsets[:] = layer_offsets
+    return (parents, label_ids, colors)
+
+# Writer
+# --------------------------------------------------
+
+def write(expansion: Expansion, path: str):
+    """Write the given expanded tree to a store at the given path."""
+
+    (parents, label_ids, colors) = _create(
+        path, len(expansion), expansion.layer_offsets, expansion.labels)
+    parents[:] = expansion.parents
+    label_ids[:] = expansion.label_ids
+    colors[:] = expansion.colors
+    for array in (parents, label_ids, colors):
+        if isinstance(array, np.memmap):
+            array.flush()
+
+def write_spec(spec: Optional[Node], path: str):
+    """
+    Expand the given spec tree directly into a store at the given path.
+
+    Only one layer of the expanded tree is held in memory at a time.
+    """
+
+    if spec is None:
+        _create(path, 0, [0], [])
+        return
+
+    table = _SpecTable(spec)
+    sizes = [int(size[0]) for size in table.subtree_sizes()]
+    layer_offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+
+    (parents, label_ids, colors) = _create(
+        path, int(layer_offsets[-1]), layer_offsets, table.labels)
+    for (i, (spec_ids, layer_parents, layer_colors)) in enumerate(
+        expand_layers(table)
+    ):
+        (start, stop) = (layer_offsets[i], layer_offsets[i+1])
+        parents[start:stop] = layer_parents
+        label_ids[start:stop] = table.label_ids[spec_ids]
+        colors[start:stop] = layer_colors
+
+    for array in (parents, label_ids, colors):
+        if isinstance(array, np.memmap):
+            array.flush()
+
+# Reader
+# --------------------------------------------------
+
+def _open(path: str, mode: str) -> Expansion:
+    """Open the store at the given path, memory-mapped with the given mode."""
+
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or not header.startswith(MAGIC):
+            raise ValueError(f"not a tree store: {path}")
+
+        (_, version, num_nodes, num_layers, *flat_sections) = (
+            HEADER.unpack(header))
+        if version != VERSION:
+            raise ValueError(
+                f"unsupported tree store version {version}, in: {path}")
+        sections = list(zip(flat_sections[::2], flat_sections[1::2]))
+
+        (labels_offset, labels_size) = sections[0]
+        f.seek(labels_offset)
+        labels = json.loads(f.read(labels_size).decode())
+
+    (layer_offsets, parents, label_ids, colors) = _map(
+        path, mode, sections, (num_layers + 1, num_nodes, num_nodes, num_nodes))
+    return Expansion(parents, label_ids, colors, layer_offsets, labels)
+
+def open_store(path: str) -> Expansion:
+    """
+    Open the store at the given path as a read-only `Expansion`, without
+    reading its node arrays into memory.
+    """
+    return _open(path, "r")
+
+# Direct Usage
+# --------------------------------------------------
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(
+            "You must provide a spec and store path argument.",
+            "Syntax: python store.py <spec_str> <store_path>",
+            sep="\n"
+        )
+        sys.exit(1)
+
+    write_spec(parse(sys.argv[1]), sys.argv[2])
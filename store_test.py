@@ -0,0 +1,52 @@
+from store import *
+from treespec import parse
+from expansion import expand
+from expansion_test import SPEC, assert_same
+import numpy as np
+import pytest
+
+def test_write_open(tmp_path):
+    expansion = expand(parse(SPEC))
+    write(expansion, str(tmp_path / "tree"))
+    stored = open_store(str(tmp_path / "tree"))
+
+    assert_same(stored, expansion)
+    assert isinstance(stored.parents, np.memmap)
+
+def test_write_spec(tmp_path):
+    spec = parse(SPEC)
+    write_spec(spec, str(tmp_path / "tree"))
+    assert_same(open_store(str(tmp_path / "tree")), expand(spec))
+
+def test_empty(tmp_path):
+    write_spec(parse(""), str(tmp_path / "tree"))
+    stored = open_store(str(tmp_path / "tree"))
+    assert len(stored) == 0
+    assert stored.num_layers() == 0
+
+def test_read_only(tmp_path):
+    write_spec(parse(SPEC), str(tmp_path / "tree"))
+    stored = open_store(str(tmp_path / "tree"))
+    with pytest.raises(ValueError):
+        stored.parents[0] = 1
+
+def test_queries(tmp_path):
+    spec = parse(SPEC)
+    write_spec(spec, str(tmp_path / "tree"))
+    stored = open_store(str(tmp_path / "tree"))
+    expansion = expand(spec)
+
+    assert stored.find("G").tolist() == expansion.find("G").tolist()
+    assert stored.find("G", 5).tolist() == expansion.find("G", 5).tolist()
+    assert len(stored.find("G", 6)) == 12
+    assert stored.find("X").tolist() == []
+
+    (subtree, ids) = stored.subtree(4, 2)
+    (expected, expected_ids) = expansion.subtree(4, 2)
+    assert_same(subtree, expected)
+    assert ids.tolist() == expected_ids.tolist()
+
+def test_f_not_store(tmp_path):
+    (tmp_path / "tree").write_bytes(b"hello world")
+    with pytest.raises(ValueError):
+        open_store(str(tmp_path / "tree"))
@@ -257,6 +257,22 @@ class Builder:
     def __init__(self, name):
         self.root = Node(name)
         self.cur = self.root
+        self.shared = False
+
+    @classmethod
+    def of(cls, node):
+        """
+        Make a builder whose root is an existing (possibly shared) node spec.
+
+        As the node spec may be referenced from elsewhere, nothing can be
+        related to from the resulting builder's ends.
+        """
+
+        builder = cls.__new__(cls)
+        builder.root = node
+        builder.cur = node
+        builder.shared = True
+        return builder
 
     def node(self, name):
         next = Node(name)
@@ -264,6 +280,20 @@ class Builder:
         self.cur = next
         return self
 
+    def subtree(self, node):
+        """
+        Relate to an existing node spec by reference, rather than by copy.
+
+        The same node spec may be given to any number of builders (or to the
+        same builder, in different branches), and will be shared by all of
+        them. Nothing can be related to from it afterwards.
+        """
+
+        self.cur.to_node(node)
+        self.cur = node
+        self.shared = True
+        return self
+
     def branch(self, *builders):
         next = [builder.get_root() for builder in builders]
         self.cur.to_nodes(next)
@@ -271,6 +301,12 @@ class Builder:
         return self
 
     def to(self, num=1, combo="X"):
+        if self.is_shared():
+            raise ValueError(
+                "cannot relate from a shared subtree, as it may be referenced"
+                " from elsewhere"
+            )
+
         relation = Relation(num, combo)
         for end in self.get_ends():
             end.relate(relation)
@@ -280,6 +316,11 @@ class Builder:
     def get_root(self):
         return self.root
 
+    def is_shared(self):
+        if utils.is_iterable(self.cur):
+            return any(builder.is_shared() for builder in self.cur)
+        return self.shared
+
     def get_ends(self):
         if utils.is_iterable(self.cur):
             ends = list(itertools.chain.from_iterable(
@@ -291,6 +332,8 @@ class Builder:
 # Parser (Str -> Object Model)
 # --------------------------------------------------
 
+MACRO_PREFIX = "$"
+
 def _get_next_node(rest, spec_str):
     """
     Parse the next part as a node spec.
@@ -315,7 +358,7 @@ def _get_next_node(rest, spec_str):
     # Return needed values
     return (name, rel_spec, rest)
 
-def _get_next_branch(rest, spec_str):
+def _get_next_branch(rest, spec_str, macros):
     """
     Parse the next part as a branch spec.
 
@@ -338,12 +381,76 @@ def _get_next_branch(rest, spec_str):
 
     # Handle divergent substructure (multiple sub-trees)
     subtrees_str = utils.split_top_level(part, ",", [("(", ")")])
-    builders = list(map(lambda subtree_str: _parse(subtree_str), subtrees_str))
+    builders = list(map(
+        lambda subtree_str: _parse(subtree_str, macros),
+        subtrees_str
+    ))
 
     # Return needed values
     return (builders, rel_spec, rest)
 
-def _parse(spec_str: str) -> Optional[Builder]:
+class _Macros:
+    """
+    The named subtree definitions of a spec.
+
+    Each definition is parsed at most once, when it is first referenced (or
+    when all definitions are resolved), and every reference to it resolves to
+    the same `Node`.
+    """
+
+    def __init__(self, spec_str):
+        self.spec_str = spec_str
+        self.defs = {}
+        self.nodes = {}
+        self.resolving = []
+
+    def define(self, def_str):
+        (name, body) = utils.pad_list(def_str.split("=", 1), 2, None)
+        if body is None:
+            raise ValueError(
+                f"subtree definition '{def_str}' has no '=', in: {self.spec_str}")
+        if not _is_reference(name) or name == MACRO_PREFIX:
+            raise ValueError(
+                f"subtree definition names must start with '{MACRO_PREFIX}'"
+                f" and cannot be blank, in: {self.spec_str}"
+            )
+        if name in self.defs:
+            raise ValueError(
+                f"subtree '{name}' is defined more than once, in: {self.spec_str}")
+        if body == "":
+            raise ValueError(
+                f"subtree '{name}' cannot be blank, in: {self.spec_str}")
+
+        self.defs[name] = body
+
+    def resolve(self, name):
+        if name in self.nodes:
+            return self.nodes[name]
+
+        if name not in self.defs:
+            raise ValueError(f"undefined subtree '{name}', in: {self.spec_str}")
+        if name in self.resolving:
+            cycle = " -> ".join(self.resolving[self.resolving.index(name):])
+            raise ValueError(
+                f"subtree '{name}' references itself ({cycle} -> {name}),"
+                f" in: {self.spec_str}"
+            )
+
+        self.resolving.append(name)
+        node = _parse(self.defs[name], self).get_root()
+        self.resolving.pop()
+
+        self.nodes[name] = node
+        return node
+
+    def resolve_all(self):
+        for name in self.defs:
+            self.resolve(name)
+
+def _is_reference(name):
+    return name.startswith(MACRO_PREFIX)
+
+def _parse(spec_str: str, macros: _Macros) -> Optional[Builder]:
     """
     Parse the given string of TSL into a spec tree, returning the root builder.
     """
@@ -354,7 +461,10 @@ def _parse(spec_str: str) -> Optional[Builder]:
 
     # Split off first node and make the root builder
     (root_name, rel_spec, rest) = _get_next_node(spec_str, spec_str)
-    builder = Builder(root_name)
+    if _is_reference(root_name):
+        builder = Builder.of(macros.resolve(root_name))
+    else:
+        builder = Builder(root_name)
 
     # Make the rest of the nodes
     while rest is not None:
@@ -368,24 +478,44 @@ def _parse(spec_str: str) -> Optional[Builder]:
 
             # FIXME: num may be more than one character!!!
             (num, combo, struct) = rel_spec # from last iteration
-            builder.to(num, combo)
         else:
-            builder.to()
+            (num, combo, struct) = ("1", "X", "C")
+
+        try:
+            builder.to(num, combo)
+        except ValueError as e:
+            raise ValueError(f"{e}, in: {spec_str}") from e
 
-        if rel_spec is None or struct == "C":
+        if struct == "C":
             # Split off next node, and keep going
             (node_name, rel_spec, rest) = _get_next_node(rest, spec_str)
-            builder.node(node_name)
+            if _is_reference(node_name):
+                builder.subtree(macros.resolve(node_name))
+            else:
+                builder.node(node_name)
 
         elif struct == "D":
-            (branch_builders, rel_spec, rest) = _get_next_branch(rest, spec_str)
+            (branch_builders, rel_spec, rest) = _get_next_branch(
+                rest, spec_str, macros)
             builder.branch(*branch_builders)
 
     # Return the *builder*
     return builder
 
 def parse(spec_str: str) -> Optional[Node]:
-    """Parse the given spec string into a spec tree."""
+    """
+    Parse the given spec string into a spec tree.
+
+    A spec may start with any number of named subtree definitions (macros),
+    each terminated by `;`, like so:
+        $Leaf = F {2XC}-> G; A {2XD}-> (E {3IC}-> $Leaf, $Leaf)
+
+    A reference (`$Leaf`) can be given anywhere a node spec or branch member
+    can, but must end its subtree, ie. nothing can be related to from it. Each
+    definition is parsed once, and all references to it resolve to the same
+    `Node` object. Definitions can reference each other in any order, but not
+    cyclically.
+    """
 
     # Remove ALL unescaped whitespace
     spec_str = (spec_str
@@ -405,12 +535,61 @@ def parse(spec_str: str) -> Optional[Node]:
         .replace("\\n", "\n")
     )
 
-    builder = _parse(spec_str)
+    # Split off subtree definitions
+    parts = utils.split_top_level(spec_str, ";", [("(", ")")])
+    macros = _Macros(spec_str)
+    for def_str in parts[:-1]:
+        macros.define(def_str)
+
+    builder = _parse(parts[-1], macros)
+    macros.resolve_all()
     if builder is None:
         return builder
     else:
         return builder.get_root()
 
+# Analysis
+# --------------------------------------------------
+
+def layer_sizes(spec: Optional[Node]) -> list:
+    """
+    Return the number of nodes in each layer of the tree that `graph()` would
+    expand the given spec tree into, without expanding it.
+
+    Each layer is represented by the number of copies of each unique node spec
+    in it, so this is proportional to the number of unique node specs per
+    layer, not to the number of nodes.
+    """
+
+    if spec is None:
+        return []
+
+    sizes = []
+    layer = {id(spec): (spec, 1)}
+    while len(layer) > 0:
+        sizes.append(sum(count for (_, count) in layer.values()))
+
+        next_layer = {}
+        for (node, count) in layer.values():
+            rel = node.get_relation()
+            if rel is None:
+                continue
+
+            next_nodes = rel.get_next()
+            if utils.is_iterable(next_nodes):
+                copies = 1
+            else:
+                next_nodes = [next_nodes]
+                copies = rel.get_num()
+
+            for next_node in next_nodes:
+                (_, next_count) = next_layer.get(id(next_node), (None, 0))
+                next_layer[id(next_node)] = (
+                    next_node, next_count + count * copies)
+        layer = next_layer
+
+    return sizes
+
 # Generator (Object Model -> Graph)
 # --------------------------------------------------
 
@@ -494,5 +673,10 @@ if __name__ == "__main__":
         engine = "dot"
 
     spec = parse(spec_str)
-    g = graph(spec, engine)
-    g.render("graph", format="png", cleanup=True)
+    if engine == "native":
+        # Lay out natively, for trees too large for graphviz
+        import layout
+        layout.render(spec, "graph")
+    else:
+        g = graph(spec, engine)
+        g.render("graph", format="png", cleanup=True)
@@ -79,3 +79,66 @@ def test_branch_consistent_continuation():
         .to(2).branch(Builder("b"), Builder("c"))
         .to().node("d")
         .get_root())
+
+def test_macro():
+    spec = parse("$s = b {2XC}-> c; a {2XD}-> ($s, $s)")
+    assert spec == (Builder("a")
+        .to(2).branch(
+            Builder("b").to(2).node("c"),
+            Builder("b").to(2).node("c")
+        )
+        .get_root())
+
+def test_macro_shared():
+    spec = parse("$s = b -> c; a {2XD}-> ($s, d {3IC}-> $s)")
+    (first, second) = spec.get_relation().get_next()
+    assert first is second.get_relation().get_next()
+
+def test_macro_root():
+    assert parse("$s = a -> b; $s") == Builder("a").to().node("b").get_root()
+
+def test_macro_nested():
+    spec = parse("$t = c; $s = b -> $t; a -> $s")
+    assert spec == Builder("a").to().node("b").to().node("c").get_root()
+
+def test_f_macro_undefined():
+    with pytest.raises(ValueError):
+        parse("a -> $s")
+
+def test_f_macro_redefined():
+    with pytest.raises(ValueError):
+        parse("$s = b; $s = c; a -> $s")
+
+def test_f_macro_cycle():
+    with pytest.raises(ValueError):
+        parse("$s = b -> $t; $t = c -> $s; a -> $s")
+
+    with pytest.raises(ValueError):
+        parse("$s = b -> $s; a")
+
+def test_f_macro_continued():
+    with pytest.raises(ValueError):
+        parse("$s = b; a -> $s -> c")
+
+    with pytest.raises(ValueError):
+        parse("$s = b; a {2XD}-> ($s, c) -> d")
+
+def test_builder_subtree_shared():
+    shared = Builder("b").to().node("c").get_root()
+    spec = Builder("a").to(2).branch(
+        Builder("x").to().subtree(shared),
+        Builder("y").to().subtree(shared)
+    ).get_root()
+    assert parse("$s = b -> c; a {2XD}-> (x -> $s, y -> $s)") == spec
+
+def test_layer_sizes():
+    assert layer_sizes(parse("")) == []
+    assert layer_sizes(parse("a")) == [1]
+    assert layer_sizes(parse("A {3IC}-> B -> C {2XC}-> D")) == [1, 3, 3, 6]
+    assert layer_sizes(parse(
+        "A -> B {2IC}-> C -> D {2XD}-> (E {3IC}-> F {2XC}-> G, E -> GXX)"
+    )) == [1, 1, 2, 2, 4, 8, 12]
+
+def test_layer_sizes_macro():
+    assert layer_sizes(parse("$s = b {3XC}-> c; a {2XD}-> ($s, x -> $s)")) == (
+        [1, 2, 4, 3])
@@ -0,0 +1,300 @@
+"""
+Watches Tree Spec Language (TSL) files, and re-renders them when (and only when)
+the tree they specify changes.
+
+Changes that don't affect the parsed spec tree (eg. whitespace, or reordering
+subtree definitions) don't trigger a render. File system events are received
+via inotify if the optional `inotify_simple` package is installed, otherwise
+the watched files are polled.
+"""
+
+import os
+import sys
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import utils
+from treespec import Node, parse, graph
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+SPEC_SUFFIX = ".tsl"
+
+# Canonicalisation
+# --------------------------------------------------
+
+def digest(spec: Optional[Node]) -> str:
+    """
+    Return a digest of the structure of the given spec tree.
+
+    Two spec trees have the same digest if and only if they're equal (barring
+    hash collisions). Shared subtrees are only hashed once, so this is linear
+    in the number of unique `Node`s, not in the size of the spec's text.
+    """
+
+    if spec is None:
+        return hashlib.sha256(b"").hexdigest()
+
+    # Order the unique nodes so that each comes after all nodes below it
+    order = []
+    seen = set()
+    stack = [(spec, False)]
+    while len(stack) > 0:
+        (node, children_done) = stack.pop()
+        if children_done:
+            order.append(node)
+            continue
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+
+        stack.append((node, True))
+        rel = node.get_relation()
+        if rel is not None:
+            next_nodes = rel.get_next()
+            if not utils.is_iterable(next_nodes):
+                next_nodes = [next_nodes]
+            stack.extend(
+                (next_node, False) for next_node in next_nodes
+                if id(next_node) not in seen
+            )
+
+    memo = {}
+    for node in order:
+        h = hashlib.sha256()
+        h.update(b"N" + node.get_name().encode() + b"\0")
+
+        rel = node.get_relation()
+        if rel is not None:
+            next_nodes = rel.get_next()
+            h.update(
+                f"R{rel.get_num()}"
+                f"{'I' if rel.is_inclusive() else 'X'}".encode()
+            )
+            if utils.is_iterable(next_nodes):
+                h.update(b"D")
+                for next_node in next_nodes:
+                    h.update(memo[id(next_node)])
+            else:
+                h.update(b"C" + memo[id(next_nodes)])
+
+        memo[id(node)] = h.digest()
+
+    return memo[id(spec)].hex()
+
+# Watcher
+# --------------------------------------------------
+
+def find_specs(path: str) -> list:
+    """
+    Return the spec files at the given path.
+
+    If the path is a directory, this is every file directly in it with the
+    spec file suffix, otherwise it's the path itself.
+    """
+
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if name.endswith(SPEC_SUFFIX)
+        )
+    return [path]
+
+def render(spec: Optional[Node], spec_path: str, engine: str = "dot"):
+    """
+    Render the given spec to a PNG next to its spec file.
+
+    Only the PNG is written (not the DOT source), so no file other than the
+    PNG is ever replaced, even if the spec file has no extension.
+    """
+
+    out_path = os.path.splitext(spec_path)[0] + ".png"
+    if out_path == spec_path:
+        out_path = spec_path + ".png"
+
+    png = graph(spec, engine).pipe(format="png")
+    with open(out_path, "wb") as f:
+        f.write(png)
+
+class Watcher:
+    """
+    Watches a spec file, or a directory of spec files, and renders any that
+    have effectively changed since they were last rendered.
+
+    Bursts of file system events (eg. from an editor saving a file in several
+    steps) are debounced: specs are only checked once no events have been seen
+    for `debounce` seconds. Changed specs are rendered concurrently.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        engine: str = "dot",
+        debounce: float = 0.2,
+        poll_interval: float = 0.5,
+        renderer=render
+    ):
+        self.path = path
+        self.engine = engine
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.renderer = renderer
+
+        self.digests = {}
+
+    def check(self, spec_paths: Optional[list] = None) -> list:
+        """
+        Parse the given spec files (or all watched files), and render those
+        whose spec tree differs from the last render of them.
+
+        Returns the paths of the rendered spec files.
+        """
+
+        if spec_paths is None:
+            spec_paths = find_specs(self.path)
+
+        changed = []
+        for spec_path in spec_paths:
+            try:
+                with open(spec_path) as spec_file:
+                    spec = parse(spec_file.read())
+            except FileNotFoundError:
+                self.digests.pop(spec_path, None)
+                continue
+            except ValueError as e:
+                print(f"{spec_path}: {e}", file=sys.stderr)
+                continue
+
+            spec_digest = digest(spec)
+            if self.digests.get(spec_path) != spec_digest:
+                changed.append((spec_path, spec, spec_digest))
+
+        with ThreadPoolExecutor() as executor:
+            futures = [
+                (spec_path, spec_digest, executor.submit(
+                    self.renderer, spec, spec_path, self.engine))
+                for (spec_path, spec, spec_digest) in changed
+            ]
+
+        rendered = []
+        for (spec_path, spec_digest, future) in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"{spec_path}: {e}", file=sys.stderr)
+                continue
+            self.digests[spec_path] = spec_digest
+            rendered.append(spec_path)
+
+        return rendered
+
+    def run(self):
+        """Render all watched specs, then re-render them as they change."""
+
+        self.check()
+        if inotify_simple is not None:
+            events = self._inotify_events()
+        else:
+            events = self._poll_events()
+
+        for spec_paths in events:
+            self.check(spec_paths)
+
+    def _is_watched(self, path):
+        if os.path.isdir(self.path):
+            return (
+                os.path.dirname(path) == self.path.rstrip(os.sep)
+                and path.endswith(SPEC_SUFFIX)
+            )
+        return os.path.abspath(path) == os.path.abspath(self.path)
+
+    def _inotify_events(self):
+        # Watch the directory, even for single files, as many editors save by
+        # replacing the file.
+        if os.path.isdir(self.path):
+            watch_dir = self.path.rstrip(os.sep)
+        else:
+            watch_dir = os.path.dirname(self.path) or "."
+
+        flags = inotify_simple.flags
+        inotify = inotify_simple.INotify()
+        inotify.add_watch(
+            watch_dir,
+            flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.DELETE
+        )
+
+        while True:
+            # Block for the first event, then collect until events stop
+            spec_paths = set()
+            events = inotify.read()
+            while len(events) > 0:
+                for event in events:
+                    spec_path = os.path.join(watch_dir, event.name)
+                    if self._is_watched(spec_path):
+                        spec_paths.add(spec_path)
+                events = inotify.read(timeout=int(self.debounce * 1000))
+
+            if len(spec_paths) > 0:
+                yield sorted(spec_paths)
+
+    def _poll_events(self):
+        def stat_all():
+            stats = {}
+            for spec_path in find_specs(self.path):
+                try:
+                    st = os.stat(spec_path)
+                except FileNotFoundError:
+                    continue
+                stats[spec_path] = (st.st_mtime_ns, st.st_size)
+            return stats
+
+        last = stat_all()
+        while True:
+            time.sleep(self.poll_interval)
+            current = stat_all()
+            if current == last:
+                continue
+
+            # Wait for the burst of changes to settle
+            while True:
+                time.sleep(self.debounce)
+                settled = stat_all()
+                if settled == current:
+                    break
+                current = settled
+
+            spec_paths = sorted(
+                spec_path for spec_path in set(last) | set(current)
+                if last.get(spec_path) != current.get(spec_path)
+            )
+            last = current
+            yield spec_paths
+
+# Direct Usage
+# --------------------------------------------------
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(
+            "You must provide a spec file or directory argument.",
+            "Syntax: python watch.py <spec_file_or_dir> [<engine>]",
+            sep="\n"
+        )
+        sys.exit(1)
+    path = sys.argv[1]
+
+    if len(sys.argv) >= 3:
+        engine = sys.argv[2]
+    else:
+        engine = "dot"
+
+    try:
+        Watcher(path, engine).run()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,92 @@
+import graphviz
+
+from watch import *
+from treespec import parse
+
+def test_digest_equal():
+    assert digest(parse("a {2XC}-> b")) == digest(parse("a{2XC}->b"))
+
+def test_digest_differs():
+    assert digest(parse("a {2XC}-> b")) != digest(parse("a {2IC}-> b"))
+    assert digest(parse("a {2XC}-> b")) != digest(parse("a {3XC}-> b"))
+    assert digest(parse("a -> b")) != digest(parse("a -> c"))
+    assert digest(parse("a {2XD}-> (b, c)")) != digest(parse("a {2XD}-> (c, b)"))
+
+def test_digest_macro():
+    assert (
+        digest(parse("$s = b -> c; a {2XD}-> ($s, $s)"))
+        == digest(parse("a {2XD}-> (b -> c, b -> c)"))
+    )
+
+def test_digest_empty():
+    assert digest(parse("")) == digest(None)
+
+def test_find_specs(tmp_path):
+    (tmp_path / "a.tsl").write_text("a")
+    (tmp_path / "b.txt").write_text("b")
+    assert find_specs(str(tmp_path)) == [str(tmp_path / "a.tsl")]
+    assert find_specs(str(tmp_path / "b.txt")) == [str(tmp_path / "b.txt")]
+
+def test_render_keeps_spec_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        graphviz.Digraph, "pipe", lambda self, format: b"png:" + format.encode())
+    (tmp_path / "x").write_text("sibling")
+    (tmp_path / "x.tsl").write_text("a -> b")
+    (tmp_path / "myspec").write_text("a -> c")
+
+    watcher = Watcher(str(tmp_path / "myspec"))
+    watcher.check()
+    assert (tmp_path / "myspec").read_text() == "a -> c"
+    assert (tmp_path / "myspec.png").read_bytes() == b"png:png"
+
+    watcher = Watcher(str(tmp_path))
+    watcher.check()
+    assert (tmp_path / "x").read_text() == "sibling"
+    assert (tmp_path / "x.png").read_bytes() == b"png:png"
+
+def make_watcher(path):
+    renders = []
+    watcher = Watcher(
+        str(path),
+        renderer=lambda spec, spec_path, engine: renders.append(spec_path)
+    )
+    return (watcher, renders)
+
+def test_watcher_renders_only_on_change(tmp_path):
+    spec_path = tmp_path / "a.tsl"
+    spec_path.write_text("a -> b")
+    (watcher, renders) = make_watcher(tmp_path)
+
+    assert watcher.check() == [str(spec_path)]
+    spec_path.write_text("a  ->\n  b")
+    assert watcher.check() == []
+    spec_path.write_text("a -> c")
+    assert watcher.check() == [str(spec_path)]
+    assert renders == [str(spec_path)] * 2
+
+def test_watcher_skips_invalid(tmp_path):
+    spec_path = tmp_path / "a.tsl"
+    spec_path.write_text("a ->")
+    (watcher, renders) = make_watcher(tmp_path)
+
+    assert watcher.check() == []
+    spec_path.write_text("a -> b")
+    assert watcher.check() == [str(spec_path)]
+
+def test_watcher_multiple(tmp_path):
+    (tmp_path / "a.tsl").write_text("a")
+    (tmp_path / "b.tsl").write_text("b")
+    (watcher, renders) = make_watcher(tmp_path)
+
+    assert watcher.check() == [str(tmp_path / "a.tsl"), str(tmp_path / "b.tsl")]
+    assert sorted(renders) == [str(tmp_path / "a.tsl"), str(tmp_path / "b.tsl")]
+
+def test_deep(tmp_path):
+    spec_str = "a" + " -> b" * 3000
+    assert digest(parse(spec_str)) == digest(parse(spec_str))
+    assert digest(parse(spec_str)) != digest(parse(spec_str + " -> b"))
+
+    (tmp_path / "deep.tsl").write_text(spec_str)
+    (watcher, renders) = make_watcher(tmp_path)
+    watcher.check()
+    assert renders == [str(tmp_path / "deep.tsl")]